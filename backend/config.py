@@ -5,6 +5,7 @@ Configuration management for the RoboMaster TT 3D Simulator
 import json
 import yaml
 import os
+from dataclasses import replace
 from pathlib import Path
 from typing import Dict, Any, Optional
 from .models import SimulationConfig
@@ -35,14 +36,12 @@ class ConfigManager:
                     data = yaml.safe_load(f)
 
             # Update config with loaded values
-            for key, value in data.items():
-                if hasattr(self.config, key):
-                    setattr(self.config, key, value)
+            self.config = self._with_updates(data)
 
         except Exception as e:
             print(f"Error loading config: {e}")
             print("Using default configuration")
-        self.config.backend_port = os.getenv("PORT", self.config.backend_port)
+        self.config = replace(self.config, backend_port=os.getenv("PORT", self.config.backend_port))
         return self.config
 
     def save_config(self) -> None:
@@ -76,11 +75,14 @@ class ConfigManager:
 
     def update_config(self, updates: Dict[str, Any]) -> None:
         """Update configuration with new values"""
-        for key, value in updates.items():
-            if hasattr(self.config, key):
-                setattr(self.config, key, value)
+        self.config = self._with_updates(updates)
         self.save_config()
 
+    def _with_updates(self, updates: Dict[str, Any]) -> SimulationConfig:
+        """Copy of the current config with the known keys of updates applied"""
+        known = {key: value for key, value in updates.items() if hasattr(self.config, key)}
+        return replace(self.config, **known)
+
     def get_config(self) -> SimulationConfig:
         """Get current configuration"""
         return self.config
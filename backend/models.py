@@ -2,22 +2,127 @@
 Core data models for the RoboMaster TT 3D Simulator
 """
 from dataclasses import dataclass
-from typing import Tuple, List
+from typing import Tuple, List, Dict, Optional
 from datetime import datetime
+import numpy as np
 
 
-@dataclass
 class Vector3:
-    """3D vector for position, velocity, rotation, etc."""
-    x: float = 0.0
-    y: float = 0.0
-    z: float = 0.0
+    """3D vector for position, velocity, rotation, etc.
+    
+    Components live in a length-3 float array (float64 unless it is a view),
+    which may be a view into a larger buffer (see DroneState) so that several
+    vectors can be processed with a single NumPy operation.
+    """
+    __slots__ = ('_v',)
+    
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0):
+        self._v = np.array((x, y, z), dtype=np.float64)
+    
+    @classmethod
+    def view(cls, buffer: np.ndarray) -> "Vector3":
+        """Create a vector backed by (not copied from) a length-3 array"""
+        vector = cls.__new__(cls)
+        vector._v = buffer
+        return vector
+    
+    @property
+    def x(self) -> float:
+        return float(self._v[0])
+    
+    @x.setter
+    def x(self, value: float) -> None:
+        self._v[0] = value
+    
+    @property
+    def y(self) -> float:
+        return float(self._v[1])
+    
+    @y.setter
+    def y(self, value: float) -> None:
+        self._v[1] = value
+    
+    @property
+    def z(self) -> float:
+        return float(self._v[2])
+    
+    @z.setter
+    def z(self, value: float) -> None:
+        self._v[2] = value
+    
+    def as_tuple(self) -> Tuple[float, float, float]:
+        """Components as plain Python floats, read in one call"""
+        return tuple(self._v.tolist())
+    
+    def set(self, x: float, y: float, z: float) -> None:
+        """Overwrite all three components in place, in one array write"""
+        self._v[:] = (x, y, z)
+    
+    def to_dict(self, decimals: Optional[int] = None) -> Dict[str, float]:
+        """Components as a dict, optionally rounded to decimals places"""
+        components = self._v.astype(np.float64)
+        if decimals is not None:
+            components = components.round(decimals)
+        x, y, z = components.tolist()
+        return {"x": x, "y": y, "z": z}
+    
+    def __repr__(self):
+        return f"Vector3(x={self.x!r}, y={self.y!r}, z={self.z!r})"
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return bool((self._v == other._v).all())
+    
+    __hash__ = None
     
     def __add__(self, other):
-        return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
+        return Vector3.view(np.add(self._v, other._v, dtype=np.float64))
     
     def __mul__(self, scalar):
-        return Vector3(self.x * scalar, self.y * scalar, self.z * scalar)
+        return Vector3.view(np.multiply(self._v, scalar, dtype=np.float64))
+
+
+# Offsets of the vector fields within DroneState's 12-float buffer
+VECTOR_FIELD_OFFSETS = {'position': 0, 'velocity': 3, 'acceleration': 6, 'rotation': 9}
+
+
+class _BufferedVector:
+    """Dataclass field descriptor storing a Vector3 inside DroneState._buf
+    
+    Assigning a Vector3 copies its components into the drone's buffer, so the
+    vector objects handed out by a DroneState always stay views of it.
+    """
+    
+    def __init__(self, offset: int):
+        self.offset = offset
+    
+    def __set_name__(self, owner, name):
+        self.attr = '_' + name
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return None  # Dataclass default
+        return instance.__dict__[self.attr]
+    
+    def __set__(self, instance, value):
+        vector = instance.__dict__.get(self.attr)
+        if vector is None:
+            buffer = instance.__dict__.get('_buf')
+            if buffer is None:
+                buffer = instance.__dict__['_buf'] = np.zeros(12, dtype=np.float64)
+            vector = Vector3.view(buffer[self.offset:self.offset + 3])
+            instance.__dict__[self.attr] = vector
+        if value is None:
+            vector._v[:] = 0.0
+        else:
+            vector._v[:] = value._v
+    
+    def rebind(self, instance, buffer: np.ndarray) -> None:
+        """Point the instance's vector at its slice of a new buffer"""
+        vector = instance.__dict__.get(self.attr)
+        if vector is not None:
+            vector._v = buffer[self.offset:self.offset + 3]
 
 
 @dataclass
@@ -28,9 +133,11 @@ class DroneState:
     udp_port: int
     
     # Position and Orientation
-    position: Vector3 = None  # x, y, z in cm
-    rotation: Vector3 = None  # pitch, yaw, roll in degrees
-    velocity: Vector3 = None  # vx, vy, vz in cm/s
+    # Vector fields share one contiguous buffer, _buf[0:12], in the order
+    # position, velocity, acceleration, rotation
+    position: Vector3 = _BufferedVector(VECTOR_FIELD_OFFSETS['position'])  # x, y, z in cm
+    rotation: Vector3 = _BufferedVector(VECTOR_FIELD_OFFSETS['rotation'])  # pitch, yaw, roll in degrees
+    velocity: Vector3 = _BufferedVector(VECTOR_FIELD_OFFSETS['velocity'])  # vx, vy, vz in cm/s
     
     # Flight Status
     is_flying: bool = False
@@ -41,7 +148,7 @@ class DroneState:
     battery: int = 100  # percentage 0-100
     temperature: int = 25  # celsius
     barometer: int = 0  # cm
-    acceleration: Vector3 = None  # agx, agy, agz in cm/s²
+    acceleration: Vector3 = _BufferedVector(VECTOR_FIELD_OFFSETS['acceleration'])  # agx, agy, agz in cm/s²
     
     # Mission Pad Detection
     mission_pad_id: int = -1  # -1 if not detected
@@ -58,22 +165,44 @@ class DroneState:
     last_update_time: float = 0.0
     
     def __post_init__(self):
-        """Initialize default values for Vector3 fields"""
-        if self.position is None:
-            self.position = Vector3()
-        if self.rotation is None:
-            self.rotation = Vector3()
-        if self.velocity is None:
-            self.velocity = Vector3()
-        if self.acceleration is None:
-            self.acceleration = Vector3()
-        
+        """Initialize default timestamps"""
         # Set initial timestamps
         current_time = datetime.now().timestamp()
         if self.last_command_time == 0.0:
             self.last_command_time = current_time
         if self.last_update_time == 0.0:
             self.last_update_time = current_time
+    
+    def bind_buffer(self, buffer: np.ndarray) -> None:
+        """Move the vector fields into buffer, a length-12 float array
+        
+        Current values are copied across and the existing Vector3 objects are
+        re-pointed, so references to them stay live.
+        """
+        buffer[:] = self._buf
+        self.__dict__['_buf'] = buffer
+        for attribute in vars(DroneState).values():
+            if isinstance(attribute, _BufferedVector):
+                attribute.rebind(self, buffer)
+    
+    def __getstate__(self):
+        """State for pickle and copy: a private copy of the buffer, without the
+        Vector3 views into it, which __setstate__ rebuilds
+        """
+        state = self.__dict__.copy()
+        for attribute in vars(DroneState).values():
+            if isinstance(attribute, _BufferedVector):
+                state.pop(attribute.attr, None)
+        state['_buf'] = self._buf.copy()
+        return state
+    
+    def __setstate__(self, state):
+        """Restore a pickled or copied state with its vectors viewing the restored buffer"""
+        self.__dict__.update(state)
+        buffer = self._buf
+        for attribute in vars(DroneState).values():
+            if isinstance(attribute, _BufferedVector):
+                self.__dict__[attribute.attr] = Vector3.view(buffer[attribute.offset:attribute.offset + 3])
 
 
 @dataclass
@@ -91,9 +220,12 @@ class DroneCommand:
             self.timestamp = datetime.now().timestamp()
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SimulationConfig:
-    """Configuration settings for the simulation environment"""
+    """Configuration settings for the simulation environment
+    
+    Frozen: derive an updated config with dataclasses.replace().
+    """
     # Server Settings
     backend_port: int = 8000
     websocket_port: int = 8001
@@ -2,39 +2,85 @@
 FastAPI backend server for RoboMaster TT 3D Simulator
 Manages drone states and provides API endpoints for mock drones and web clients
 """
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from contextlib import asynccontextmanager
 import asyncio
+import heapq
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime
+from itertools import count
+import numpy as np
 import uvicorn
 import os
-import sys
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
 
-from backend.models import DroneState, SimulationConfig, Vector3
+    def _dumps(obj: Any) -> str:
+        """Encode obj as JSON text"""
+        return orjson.dumps(obj).decode()
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultResponse
+
+    def _dumps(obj: Any) -> str:
+        """Encode obj as JSON text"""
+        # Compact separators, matching orjson's output size on the wire
+        return json.dumps(obj, separators=(',', ':'))
+
+from backend.models import DroneState, SimulationConfig, Vector3, VECTOR_FIELD_OFFSETS
 from backend.config import ConfigManager
 
 
 class DroneStateManager:
-    """Manages all drone states and coordinates updates"""
+    """Manages all drone states and coordinates updates
+    
+    The vector fields of every managed drone live in one (capacity, 12) array,
+    one row per drone in DroneState buffer order, so fleet-wide queries run as
+    NumPy operations instead of walking DroneState objects. The block keeps
+    the full float64 precision of DroneState; rounding happens only when
+    states are serialized for the wire (WIRE_DECIMALS).
+    """
+    
+    INITIAL_CAPACITY = 16
+    STATE_DTYPE = np.float64
+    # Shared by all instances so a version never repeats across managers
+    _next_version = count(1)
     
     def __init__(self):
         self.drones: Dict[str, DroneState] = {}
+        self._state_block = np.zeros((self.INITIAL_CAPACITY, 12), dtype=self.STATE_DTYPE)
+        self._id_to_row: Dict[str, int] = {}
+        self._free_rows: List[int] = []
+        self._rows_used = 0
         self.last_update_times: Dict[str, float] = {}
+        # Min-heap of (update time, drone_id); entries superseded by a later
+        # update are skipped lazily during the inactivity sweep
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Bumped on every change so serialized states can be cached per version
+        self.state_versions: Dict[str, int] = {}
         self.logger = logging.getLogger("DroneStateManager")
     
     def add_drone(self, drone_state: DroneState) -> None:
         """Add a new drone to the simulation"""
+        row = self._id_to_row.get(drone_state.drone_id)
+        if row is None:
+            row = self._allocate_row()
+            self._id_to_row[drone_state.drone_id] = row
+        else:
+            # Re-added under the same ID: detach the state being replaced from the row
+            previous = self.drones[drone_state.drone_id]
+            if previous is not drone_state:
+                previous.bind_buffer(self._state_block[row].copy())
+        drone_state.bind_buffer(self._state_block[row])
         self.drones[drone_state.drone_id] = drone_state
-        self.last_update_times[drone_state.drone_id] = datetime.now().timestamp()
+        self._record_update(drone_state.drone_id, datetime.now().timestamp())
+        self.state_versions[drone_state.drone_id] = next(self._next_version)
         self.logger.info(f"Added drone {drone_state.drone_id} on port {drone_state.udp_port}")
     
     def update_drone_state(self, drone_id: str, state_update: Dict[str, Any]) -> bool:
@@ -44,20 +90,13 @@ class DroneStateManager:
         
         drone_state = self.drones[drone_id]
         
-        # Update position
-        if 'position' in state_update:
-            pos = state_update['position']
-            drone_state.position = Vector3(pos.get('x', 0), pos.get('y', 0), pos.get('z', 0))
-        
-        # Update rotation
-        if 'rotation' in state_update:
-            rot = state_update['rotation']
-            drone_state.rotation = Vector3(rot.get('x', 0), rot.get('y', 0), rot.get('z', 0))
-        
-        # Update velocity
-        if 'velocity' in state_update:
-            vel = state_update['velocity']
-            drone_state.velocity = Vector3(vel.get('x', 0), vel.get('y', 0), vel.get('z', 0))
+        # Update position, rotation, velocity and acceleration: each is one
+        # slice write into the drone's row of the state block
+        row = self._state_block[self._id_to_row[drone_id]]
+        for field, offset in VECTOR_FIELD_OFFSETS.items():
+            if field in state_update:
+                vector = state_update[field]
+                row[offset:offset + 3] = (vector.get('x', 0), vector.get('y', 0), vector.get('z', 0))
         
         # Update other fields
         for field in ['is_flying', 'is_connected', 'battery', 'temperature', 'flight_time', 
@@ -66,17 +105,69 @@ class DroneStateManager:
             if field in state_update:
                 setattr(drone_state, field, state_update[field])
         
-        # Update acceleration
-        if 'acceleration' in state_update:
-            acc = state_update['acceleration']
-            drone_state.acceleration = Vector3(acc.get('x', 0), acc.get('y', 0), acc.get('z', 0))
-        
         # Update timestamps
         drone_state.last_update_time = datetime.now().timestamp()
-        self.last_update_times[drone_id] = drone_state.last_update_time
+        self._record_update(drone_id, drone_state.last_update_time)
+        self.state_versions[drone_id] = next(self._next_version)
         
         return True
     
+    def _allocate_row(self) -> int:
+        """Take a free row of the state block, doubling the block when full"""
+        if self._free_rows:
+            return self._free_rows.pop()
+        
+        if self._rows_used == len(self._state_block):
+            block = np.zeros((2 * len(self._state_block), 12), dtype=self.STATE_DTYPE)
+            block[:self._rows_used] = self._state_block
+            self._state_block = block
+            # Re-point the drones at their rows in the new block
+            for drone_id, drone_state in self.drones.items():
+                drone_state.bind_buffer(block[self._id_to_row[drone_id]])
+        
+        row = self._rows_used
+        self._rows_used += 1
+        return row
+    
+    def get_positions(self) -> Tuple[List[str], np.ndarray]:
+        """Get drone IDs and an (n, 3) array of their positions in the same order"""
+        drone_ids = list(self.drones)
+        rows = [self._id_to_row[drone_id] for drone_id in drone_ids]
+        return drone_ids, self._state_block[rows, 0:3]
+    
+    def get_drones_out_of_bounds(self, scene_bounds: Tuple[int, int, int]) -> List[str]:
+        """Get IDs of drones outside the scene (x, y centred on the origin, z up to the ceiling)"""
+        drone_ids, positions = self.get_positions()
+        half_extent = np.array((scene_bounds[0] / 2, scene_bounds[1] / 2))
+        outside = (np.abs(positions[:, 0:2]) > half_extent).any(axis=1) | (positions[:, 2] > scene_bounds[2])
+        return [drone_ids[i] for i in np.flatnonzero(outside)]
+    
+    def _record_update(self, drone_id: str, timestamp: float) -> None:
+        """Record the last activity time of a drone for the inactivity sweep"""
+        self.last_update_times[drone_id] = timestamp
+        heapq.heappush(self._expiry_heap, (timestamp, drone_id))
+    
+    def update_drone_state_batch(self, updates: Dict[str, Any], field: str = 'position') -> int:
+        """Set one vector field for many drones at once from drone_id -> (x, y, z)
+        
+        Unknown drone IDs are skipped. Returns the number of drones updated.
+        """
+        drone_ids = [drone_id for drone_id in updates if drone_id in self.drones]
+        if not drone_ids:
+            return 0
+        
+        rows = [self._id_to_row[drone_id] for drone_id in drone_ids]
+        offset = VECTOR_FIELD_OFFSETS[field]
+        self._state_block[rows, offset:offset + 3] = np.array([updates[drone_id] for drone_id in drone_ids])
+        
+        timestamp = datetime.now().timestamp()
+        for drone_id in drone_ids:
+            self.drones[drone_id].last_update_time = timestamp
+            self._record_update(drone_id, timestamp)
+            self.state_versions[drone_id] = next(self._next_version)
+        
+        return len(drone_ids)
+    
     def get_drone_state(self, drone_id: str) -> Optional[DroneState]:
         """Get drone state by ID"""
         return self.drones.get(drone_id)
@@ -88,47 +179,107 @@ class DroneStateManager:
     def remove_drone(self, drone_id: str) -> bool:
         """Remove drone from simulation"""
         if drone_id in self.drones:
-            del self.drones[drone_id]
+            # Give the removed state its own buffer before its row is reused
+            drone_state = self.drones.pop(drone_id)
+            row = self._id_to_row.pop(drone_id)
+            drone_state.bind_buffer(self._state_block[row].copy())
+            self._state_block[row] = 0.0
+            self._free_rows.append(row)
             if drone_id in self.last_update_times:
                 del self.last_update_times[drone_id]
+            self.state_versions.pop(drone_id, None)
             self.logger.info(f"Removed drone {drone_id}")
             return True
         return False
     
     def cleanup_inactive_drones(self, timeout_seconds: int = 30) -> List[str]:
         """Remove drones that haven't updated in timeout_seconds"""
-        current_time = datetime.now().timestamp()
+        cutoff = datetime.now().timestamp() - timeout_seconds
+        expiry_heap = self._expiry_heap
         inactive_drones = []
         
-        for drone_id, last_update in self.last_update_times.items():
-            if current_time - last_update > timeout_seconds:
-                inactive_drones.append(drone_id)
-        
-        for drone_id in inactive_drones:
+        # Only entries older than the cutoff are visited
+        while expiry_heap and expiry_heap[0][0] < cutoff:
+            last_update, drone_id = heapq.heappop(expiry_heap)
+            # Stale entry: the drone was updated again or already removed
+            if self.last_update_times.get(drone_id) != last_update:
+                continue
             self.remove_drone(drone_id)
+            inactive_drones.append(drone_id)
         
         return inactive_drones
 
 
+# Vector components are sent rounded to this many decimals (0.01 cm / degree)
+WIRE_DECIMALS = 2
+
+
 class WebSocketManager:
-    """Manages WebSocket connections and broadcasting"""
+    """Manages WebSocket connections and broadcasting
+    
+    Each connection gets a bounded send queue drained by its own sender task,
+    so broadcast never waits on a client. A client that falls behind loses its
+    oldest queued messages, and is disconnected once it has lost too many.
+    """
+    
+    SEND_QUEUE_SIZE = 100
+    MAX_DROPPED_MESSAGES = 500
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Insertion-ordered dict of connection -> send queue: O(1) add, remove
+        # and membership
+        self.active_connections: Dict[WebSocket, asyncio.Queue] = {}
+        self._senders: Dict[WebSocket, asyncio.Task] = {}
+        self.dropped_messages: Dict[WebSocket, int] = {}
+        # drone_id -> (state version, serialized state JSON)
+        self._state_json_cache: Dict[str, Tuple[int, str]] = {}
         self.logger = logging.getLogger("WebSocketManager")
     
-    async def connect(self, websocket: WebSocket):
-        """Accept new WebSocket connection"""
+    async def connect(self, websocket: WebSocket,
+                      initial_message: Optional[Callable[[], Optional[str]]] = None):
+        """Accept new WebSocket connection
+        
+        initial_message builds a message (e.g. a snapshot) for the new client.
+        It is called after the accept and queued before the connection is
+        registered for broadcasts, so the client's sender delivers it first
+        and no update falls between it and the first broadcast.
+        """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        queue = asyncio.Queue(maxsize=self.SEND_QUEUE_SIZE)
+        message = initial_message() if initial_message is not None else None
+        if message is not None:
+            queue.put_nowait(message)
+        self.active_connections[websocket] = queue
+        self._senders[websocket] = asyncio.create_task(self._sender(websocket, queue))
         self.logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
     
     def disconnect(self, websocket: WebSocket):
         """Remove WebSocket connection"""
         if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+            queue = self.active_connections.pop(websocket)
+            # Discard unsent messages so flush() doesn't wait on them
+            while not queue.empty():
+                queue.get_nowait()
+                queue.task_done()
+            self.dropped_messages.pop(websocket, None)
+            sender = self._senders.pop(websocket, None)
+            if sender is not None and sender is not asyncio.current_task():
+                sender.cancel()
             self.logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
     
+    async def _sender(self, websocket: WebSocket, queue: asyncio.Queue):
+        """Send queued messages to one WebSocket until it fails or disconnects"""
+        while True:
+            message = await queue.get()
+            try:
+                await websocket.send_text(message)
+            except Exception as e:
+                self.logger.error(f"Error broadcasting to connection: {e}")
+                self.disconnect(websocket)
+                return
+            finally:
+                queue.task_done()
+    
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send message to specific WebSocket"""
         try:
@@ -142,69 +293,81 @@ class WebSocketManager:
         if not self.active_connections:
             return
         
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                self.logger.error(f"Error broadcasting to connection: {e}")
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for connection in disconnected:
-            self.disconnect(connection)
+        for connection, queue in list(self.active_connections.items()):
+            if queue.full():
+                # Drop the oldest message rather than wait on a slow client
+                queue.get_nowait()
+                queue.task_done()
+                dropped = self.dropped_messages.get(connection, 0) + 1
+                self.dropped_messages[connection] = dropped
+                if dropped > self.MAX_DROPPED_MESSAGES:
+                    self.logger.warning(f"Disconnecting slow WebSocket after {dropped} dropped messages")
+                    self.disconnect(connection)
+                    continue
+            queue.put_nowait(message)
+    
+    async def flush(self):
+        """Wait until every queued message has been sent (or its client dropped)"""
+        await asyncio.gather(*[queue.join() for queue in self.active_connections.values()])
     
-    async def broadcast_drone_state_update(self, drone_id: str, drone_state: DroneState):
+    async def broadcast_drone_state_update(self, drone_id: str, drone_state: DroneState,
+                                           version: Optional[int] = None):
         """Broadcast drone state update to all clients"""
-        message = {
-            "type": "drone_state_update",
-            "drone_id": drone_id,
-            "state": self._serialize_drone_state(drone_state)
-        }
-        await self.broadcast(json.dumps(message))
+        await self.broadcast(self.drone_state_message(
+            "drone_state_update", "state", drone_id, drone_state, version))
     
-    async def broadcast_drone_added(self, drone_id: str, drone_state: DroneState):
+    async def broadcast_drone_added(self, drone_id: str, drone_state: DroneState,
+                                    version: Optional[int] = None):
         """Broadcast drone added event to all clients"""
-        message = {
-            "type": "drone_added",
-            "drone_id": drone_id,
-            "initial_state": self._serialize_drone_state(drone_state)
-        }
-        await self.broadcast(json.dumps(message))
+        await self.broadcast(self.drone_state_message(
+            "drone_added", "initial_state", drone_id, drone_state, version))
     
     async def broadcast_drone_removed(self, drone_id: str):
         """Broadcast drone removed event to all clients"""
+        self._state_json_cache.pop(drone_id, None)
         message = {
             "type": "drone_removed",
             "drone_id": drone_id
         }
-        await self.broadcast(json.dumps(message))
+        await self.broadcast(_dumps(message))
+    
+    def drone_state_message(self, message_type: str, state_key: str, drone_id: str,
+                            drone_state: DroneState, version: Optional[int] = None) -> str:
+        """Build a JSON message carrying a drone state under state_key"""
+        state_json = self._serialize_drone_state_json(drone_id, drone_state, version)
+        return (f'{{"type":{_dumps(message_type)},"drone_id":{_dumps(drone_id)},'
+                f'{_dumps(state_key)}:{state_json}}}')
+    
+    def snapshot_message(self, drones: Dict[str, DroneState], versions: Dict[str, int]) -> str:
+        """Build one JSON message carrying the states of all given drones"""
+        states_json = ','.join(
+            self._serialize_drone_state_json(drone_id, drone_state, versions.get(drone_id))
+            for drone_id, drone_state in drones.items()
+        )
+        return f'{{"type":"snapshot","drones":[{states_json}]}}'
+    
+    def _serialize_drone_state_json(self, drone_id: str, drone_state: DroneState,
+                                    version: Optional[int] = None) -> str:
+        """Serialize drone state to JSON text, reusing the cached text while version is unchanged"""
+        if version is not None:
+            cached = self._state_json_cache.get(drone_id)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        
+        state_json = _dumps(self._serialize_drone_state(drone_state))
+        if version is not None:
+            self._state_json_cache[drone_id] = (version, state_json)
+        return state_json
     
     def _serialize_drone_state(self, drone_state: DroneState) -> Dict[str, Any]:
         """Serialize drone state for JSON transmission"""
         return {
             "drone_id": drone_state.drone_id,
             "udp_port": drone_state.udp_port,
-            "position": {
-                "x": drone_state.position.x,
-                "y": drone_state.position.y,
-                "z": drone_state.position.z
-            },
-            "rotation": {
-                "x": drone_state.rotation.x,
-                "y": drone_state.rotation.y,
-                "z": drone_state.rotation.z
-            },
-            "velocity": {
-                "x": drone_state.velocity.x,
-                "y": drone_state.velocity.y,
-                "z": drone_state.velocity.z
-            },
-            "acceleration": {
-                "x": drone_state.acceleration.x,
-                "y": drone_state.acceleration.y,
-                "z": drone_state.acceleration.z
-            },
+            "position": drone_state.position.to_dict(WIRE_DECIMALS),
+            "rotation": drone_state.rotation.to_dict(WIRE_DECIMALS),
+            "velocity": drone_state.velocity.to_dict(WIRE_DECIMALS),
+            "acceleration": drone_state.acceleration.to_dict(WIRE_DECIMALS),
             "is_flying": drone_state.is_flying,
             "is_connected": drone_state.is_connected,
             "flight_time": drone_state.flight_time,
@@ -227,6 +390,20 @@ config_manager = ConfigManager()
 drone_state_manager = DroneStateManager()
 websocket_manager = WebSocketManager()
 
+
+def get_drone_state_manager() -> DroneStateManager:
+    """Dependency providing the drone state manager (overridable in tests)"""
+    return drone_state_manager
+
+
+def resolve_drone_state_manager() -> DroneStateManager:
+    """The drone state manager the routes get, for code outside a request
+    
+    Honours app.dependency_overrides the same way route injection does.
+    """
+    return app.dependency_overrides.get(get_drone_state_manager, get_drone_state_manager)()
+
+
 # Background task reference
 cleanup_task = None
 
@@ -255,7 +432,8 @@ app = FastAPI(
     title="RoboMaster TT 3D Simulator Backend",
     description="Backend server for managing drone states and WebSocket communication",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=DefaultResponse
 )
 
 # CORS middleware
@@ -287,15 +465,20 @@ logger = logging.getLogger("BackendServer")
 
 
 
+async def cleanup_inactive_drones_once(timeout_seconds: int = 30) -> List[str]:
+    """Remove inactive drones from the current state manager and announce their removal"""
+    inactive_drones = resolve_drone_state_manager().cleanup_inactive_drones(timeout_seconds)
+    for drone_id in inactive_drones:
+        await websocket_manager.broadcast_drone_removed(drone_id)
+        logger.info(f"Cleaned up inactive drone: {drone_id}")
+    return inactive_drones
+
+
 async def cleanup_inactive_drones_task():
     """Background task to cleanup inactive drones"""
     while True:
         try:
-            inactive_drones = drone_state_manager.cleanup_inactive_drones(30)
-            for drone_id in inactive_drones:
-                await websocket_manager.broadcast_drone_removed(drone_id)
-                logger.info(f"Cleaned up inactive drone: {drone_id}")
-            
+            await cleanup_inactive_drones_once(30)
             await asyncio.sleep(10)  # Check every 10 seconds
         except Exception as e:
             logger.error(f"Error in cleanup task: {e}")
@@ -314,38 +497,41 @@ async def root():
 
 
 @app.get("/api/health")
-async def health_check():
+async def health_check(state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """Health check endpoint"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_drones": len(drone_state_manager.drones),
+        "active_drones": len(state_manager.drones),
         "websocket_connections": len(websocket_manager.active_connections)
     }
 
 
 @app.post("/api/drones/{drone_id}/state")
-async def update_drone_state(drone_id: str, state_update: Dict[str, Any]):
+async def update_drone_state(drone_id: str, state_update: Dict[str, Any],
+                             state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """Update drone state from mock drone client"""
     try:
         # Check if drone exists, if not create it
-        if drone_id not in drone_state_manager.drones:
+        if drone_id not in state_manager.drones:
             # Create new drone state
             drone_state = DroneState(
                 drone_id=drone_id,
                 udp_port=state_update.get('udp_port', 8889)
             )
-            drone_state_manager.add_drone(drone_state)
-            await websocket_manager.broadcast_drone_added(drone_id, drone_state)
+            state_manager.add_drone(drone_state)
+            await websocket_manager.broadcast_drone_added(
+                drone_id, drone_state, state_manager.state_versions[drone_id])
         
         # Update drone state
-        success = drone_state_manager.update_drone_state(drone_id, state_update)
+        success = state_manager.update_drone_state(drone_id, state_update)
         if not success:
             raise HTTPException(status_code=404, detail="Drone not found")
         
         # Broadcast update to WebSocket clients
-        updated_state = drone_state_manager.get_drone_state(drone_id)
-        await websocket_manager.broadcast_drone_state_update(drone_id, updated_state)
+        updated_state = state_manager.get_drone_state(drone_id)
+        await websocket_manager.broadcast_drone_state_update(
+            drone_id, updated_state, state_manager.state_versions[drone_id])
         
         return {"status": "success", "message": f"Updated drone {drone_id}"}
         
@@ -355,24 +541,27 @@ async def update_drone_state(drone_id: str, state_update: Dict[str, Any]):
 
 
 @app.get("/api/drones")
-async def get_all_drones():
+async def get_all_drones(state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """Get all drone states"""
-    drones = drone_state_manager.get_all_drones()
-    serialized_drones = {}
-    
-    for drone_id, drone_state in drones.items():
-        serialized_drones[drone_id] = websocket_manager._serialize_drone_state(drone_state)
-    
-    return {
-        "drones": serialized_drones,
-        "count": len(drones)
-    }
+    # Only drones changed since their last serialization are encoded again;
+    # the rest reuse the cached JSON of their current state version
+    versions = state_manager.state_versions
+    drones_json = ','.join(
+        f'{_dumps(drone_id)}:'
+        f'{websocket_manager._serialize_drone_state_json(drone_id, drone_state, versions.get(drone_id))}'
+        for drone_id, drone_state in state_manager.drones.items()
+    )
+    return Response(
+        content=f'{{"drones":{{{drones_json}}},"count":{len(state_manager.drones)}}}',
+        media_type="application/json"
+    )
 
 
 @app.get("/api/drones/{drone_id}")
-async def get_drone_state(drone_id: str):
+async def get_drone_state(drone_id: str,
+                          state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """Get specific drone state"""
-    drone_state = drone_state_manager.get_drone_state(drone_id)
+    drone_state = state_manager.get_drone_state(drone_id)
     if not drone_state:
         raise HTTPException(status_code=404, detail="Drone not found")
     
@@ -380,9 +569,10 @@ async def get_drone_state(drone_id: str):
 
 
 @app.delete("/api/drones/{drone_id}")
-async def remove_drone(drone_id: str):
+async def remove_drone(drone_id: str,
+                       state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """Remove drone from simulation"""
-    success = drone_state_manager.remove_drone(drone_id)
+    success = state_manager.remove_drone(drone_id)
     if not success:
         raise HTTPException(status_code=404, detail="Drone not found")
     
@@ -423,23 +613,18 @@ async def update_config(config_update: Dict[str, Any]):
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket,
+                             state_manager: DroneStateManager = Depends(get_drone_state_manager)):
     """WebSocket endpoint for real-time communication"""
-    await websocket_manager.connect(websocket)
+    def snapshot():
+        """Current drone states for the new client in a single message"""
+        if state_manager.drones:
+            return websocket_manager.snapshot_message(state_manager.drones, state_manager.state_versions)
+        return None
+    
+    await websocket_manager.connect(websocket, snapshot)
     
     try:
-        # Send current drone states to new client
-        drones = drone_state_manager.get_all_drones()
-        for drone_id, drone_state in drones.items():
-            await websocket_manager.send_personal_message(
-                json.dumps({
-                    "type": "drone_added",
-                    "drone_id": drone_id,
-                    "initial_state": websocket_manager._serialize_drone_state(drone_state)
-                }),
-                websocket
-            )
-        
         # Keep connection alive and handle incoming messages
         while True:
             data = await websocket.receive_text()
@@ -49,6 +49,15 @@ class Tello:
     CONTROL_UDP_PORT = 8889
     STATE_UDP_PORT = 8890
 
+    # Kernel send/receive buffer size for the control and state sockets in bytes.
+    # None keeps the OS default. Must be set before the first Tello instance is created.
+    SOCKET_BUFFER_SIZE: Optional[int] = None
+    # Set SO_REUSEADDR (and SO_REUSEPORT where available) on the state socket, so re-runs
+    # don't fail with 'Address already in use'. Never applied to the control socket, which
+    # would then share its port with whatever else is bound there.
+    # Must be set before the first Tello instance is created.
+    REUSE_ADDRESS = False
+
     # Constants for video settings
     BITRATE_AUTO = 0
     BITRATE_1MBPS = 1
@@ -124,6 +133,7 @@ class Tello:
 
             # Run Tello command responses UDP receiver on background
             client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            Tello.apply_socket_buffer_size(client_socket, 'control', socket.SO_RCVBUF, socket.SO_SNDBUF)
             client_socket.bind(("", self.control_udp_port))
             response_receiver_thread = Thread(target=Tello.udp_response_receiver)
             response_receiver_thread.daemon = True
@@ -233,6 +243,8 @@ class Tello:
         """
         global global_state_port
         state_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        Tello.apply_socket_buffer_size(state_socket, 'state', socket.SO_RCVBUF)
+        Tello.apply_address_reuse(state_socket)
         port = global_state_port if global_state_port else Tello.STATE_UDP_PORT
         state_socket.bind(("", port))
 
@@ -253,6 +265,34 @@ class Tello:
                 Tello.LOGGER.error(e)
                 break
 
+    @staticmethod
+    def apply_socket_buffer_size(sock: socket.socket, name: str, *options: int):
+        """Apply SOCKET_BUFFER_SIZE to the given buffer options (SO_RCVBUF, SO_SNDBUF)
+        of a socket and log the size actually granted, as the kernel may cap it.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not Tello.SOCKET_BUFFER_SIZE:
+            return
+
+        for option in options:
+            sock.setsockopt(socket.SOL_SOCKET, option, Tello.SOCKET_BUFFER_SIZE)
+            granted = sock.getsockopt(socket.SOL_SOCKET, option)
+            Tello.LOGGER.info('{} socket {} set to {} bytes (requested {})'.format(
+                name, 'SO_RCVBUF' if option == socket.SO_RCVBUF else 'SO_SNDBUF',
+                granted, Tello.SOCKET_BUFFER_SIZE))
+
+    @staticmethod
+    def apply_address_reuse(sock: socket.socket):
+        """Enable address/port reuse on a socket if REUSE_ADDRESS is set.
+        Internal method, you normally wouldn't call this yourself.
+        """
+        if not Tello.REUSE_ADDRESS:
+            return
+
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):  # Linux >= 3.9, BSD, macOS
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
     @staticmethod
     def parse_state(state: str) -> Dict[str, Union[int, float, str]]:
         """Parse a state line to a dictionary
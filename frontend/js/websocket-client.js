@@ -92,6 +92,16 @@ class WebSocketClient {
     handleMessage(data) {
         console.log('WebSocket message received:', data);
         
+        // A snapshot of existing drones is replayed as one drone_added per drone
+        if (data.type === 'snapshot') {
+            data.drones.forEach(state => this.handleMessage({
+                type: 'drone_added',
+                drone_id: state.drone_id,
+                initial_state: state
+            }));
+            return;
+        }
+        
         // Emit general message event
         this.emit('message', data);
         
@@ -4,11 +4,6 @@ DroneManager - Manages multiple mock drones with automatic port assignment
 import asyncio
 import logging
 from typing import Dict, List, Optional, Set
-import sys
-import os
-
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.models import SimulationConfig
 from backend.config import ConfigManager
@@ -4,22 +4,26 @@ Mock Drone Client - Simulates RoboMaster TT drone UDP server
 import asyncio
 import socket
 import logging
-from typing import Optional, Callable
-from datetime import datetime
+from typing import Optional, Callable, Dict, Any
 import time
-import sys
-import os
 import aiohttp
 import json
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from backend.models import DroneState, DroneCommand, SimulationConfig, Vector3
 from .physics_engine import PhysicsEngine
 from .telemetry_simulator import TelemetrySimulator
 
 
+class _CommandProtocol(asyncio.DatagramProtocol):
+    """Queues datagrams received on the drone's command socket"""
+    
+    def __init__(self, datagrams: asyncio.Queue):
+        self.datagrams = datagrams
+    
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.datagrams.put_nowait((data, addr))
+
+
 class MockDrone:
     """Main mock drone class that simulates a RoboMaster TT drone"""
     
@@ -52,11 +56,13 @@ class MockDrone:
         # Physics update task
         self.physics_task = None
         self.last_physics_update = time.time()
+        self.flight_seconds = 0.0  # unrounded state.flight_time
         
         # UDP server components
         self.socket = None
         self.running = False
         self.server_task = None
+        self.server_started = asyncio.Event()  # set once commands are being served
         
         # Command processing
         self.command_handlers = {}
@@ -66,6 +72,17 @@ class MockDrone:
         self.logger = logging.getLogger(f"MockDrone-{drone_id}")
         self.setup_logging()
     
+    def reset_state(self):
+        """Return the drone to its initial flight state, keeping handlers and logging"""
+        self.state = DroneState(
+            drone_id=self.drone_id,
+            udp_port=self.udp_port
+        )
+        self.physics_engine.stop_animation(self.drone_id)
+        self.flight_seconds = 0.0
+        self.running = False
+        self.server_started.clear()
+    
     def setup_logging(self):
         """Configure logging for the mock drone"""
         handler = logging.StreamHandler()
@@ -126,18 +143,26 @@ class MockDrone:
             'baro?': self.handle_baro_query,
             'acceleration?': self.handle_acceleration_query,
         }
+        # Command types of the registered names, so the type isn't re-derived per command
+        self._command_types = {name: self.get_command_type(name) for name in self.command_handlers}
     
-    async def start_udp_server(self):
-        """Start the UDP server to listen for commands"""
+    async def start_udp_server(self, sock: Optional[socket.socket] = None):
+        """Start the UDP server to listen for commands
+        
+        An already bound socket may be passed in (e.g. one bound to port 0 in tests);
+        otherwise a socket is created and bound to udp_port.
+        """
         try:
-            # Create UDP socket
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.socket.bind(('0.0.0.0', self.udp_port))
+            if sock is None:
+                # Create UDP socket
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind(('0.0.0.0', self.udp_port))
+            self.socket = sock
             self.socket.setblocking(False)
             
             self.running = True
-            self.logger.info(f"UDP server started on port {self.udp_port}")
+            self.logger.info(f"UDP server started on port {self.socket.getsockname()[1]}")
             
             # Initialize HTTP session for backend communication
             self.http_session = aiohttp.ClientSession()
@@ -161,10 +186,24 @@ class MockDrone:
     
     async def server_loop(self):
         """Main server loop to handle incoming UDP commands"""
+        # A datagram endpoint instead of loop.sock_recvfrom/sock_sendto, which
+        # uvloop doesn't implement
+        datagrams = asyncio.Queue()
+        transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: _CommandProtocol(datagrams), sock=self.socket
+        )
+        self.server_started.set()
+        try:
+            await self._serve_commands(datagrams, transport)
+        finally:
+            transport.close()
+    
+    async def _serve_commands(self, datagrams: asyncio.Queue, transport: asyncio.DatagramTransport):
+        """Answer commands from the datagram queue until the drone stops"""
         while self.running:
             try:
                 # Wait for incoming data
-                data, addr = await asyncio.get_event_loop().sock_recvfrom(self.socket, 1024)
+                data, addr = await datagrams.get()
                 
                 # Decode command
                 command_str = data.decode('utf-8').strip()
@@ -180,11 +219,7 @@ class MockDrone:
                 
                 # Send response
                 if response:
-                    await asyncio.get_event_loop().sock_sendto(
-                        self.socket, 
-                        response.encode('utf-8'), 
-                        addr
-                    )
+                    transport.sendto(response.encode('utf-8'), addr)
                     self.logger.info(f"Sent response to {addr}: {response}")
                 
             except asyncio.CancelledError:
@@ -202,16 +237,7 @@ class MockDrone:
                 
                 # Update physics at configured rate
                 if dt >= 1.0 / self.config.update_rate:
-                    # Update physics simulation
-                    self.physics_engine.update_drone_physics(self.state, dt)
-                    
-                    # Update telemetry data
-                    self.telemetry_simulator.update_telemetry(self.state, dt)
-                    
-                    # Update flight time if flying
-                    if self.state.is_flying:
-                        self.state.flight_time += int(dt)
-                    
+                    self.physics_step(dt)
                     self.last_physics_update = current_time
                 
                 # Sleep for a short time to prevent busy waiting
@@ -223,6 +249,21 @@ class MockDrone:
                 self.logger.error(f"Error in physics loop: {e}")
                 await asyncio.sleep(0.1)
     
+    def physics_step(self, dt: float) -> None:
+        """Advance physics, telemetry and flight time by dt seconds
+        
+        Everything downstream is driven by dt alone; the clock is only read by
+        physics_loop to measure it.
+        """
+        self.physics_engine.update_drone_physics(self.state, dt)
+        self.telemetry_simulator.update_telemetry(self.state, dt)
+        
+        # Accumulate flight time unrounded; truncating each tick's dt would
+        # never count a 30 Hz tick
+        if self.state.is_flying:
+            self.flight_seconds += dt
+            self.state.flight_time = int(self.flight_seconds)
+    
     async def process_command(self, command_str: str) -> str:
         """Process incoming command and return response"""
         try:
@@ -239,20 +280,27 @@ class MockDrone:
             command_name = command_parts[0].lower()
             parameters = command_parts[1:] if len(command_parts) > 1 else []
             
+            # The handler is looked up on every call so replaced or added entries in
+            # command_handlers take effect; only the command type is cached
+            handler = self.command_handlers.get(command_name)
+            command_type = self._command_types.get(command_name)
+            if command_type is None:
+                command_type = self.get_command_type(command_name)
+            
             # Create command object
             command = DroneCommand(
-                command_type=self.get_command_type(command_name),
+                command_type=command_type,
                 command=command_name,
                 parameters=parameters,
-                timestamp=datetime.now().timestamp()
+                timestamp=time.time()
             )
             
             # Update last command time
             self.state.last_command_time = command.timestamp
             
-            # Find and execute handler
-            if command_name in self.command_handlers:
-                response = await self.command_handlers[command_name](command)
+            # Execute handler
+            if handler is not None:
+                response = await handler(command)
             else:
                 response = self.handle_unknown_command(command)
             
@@ -808,50 +856,38 @@ class MockDrone:
                 self.logger.error(f"Error in backend update loop: {e}")
                 await asyncio.sleep(1.0)  # Wait longer on error
     
+    def get_backend_state(self) -> Dict[str, Any]:
+        """Build the state payload posted to the backend server"""
+        state = self.state
+        return {
+            "udp_port": state.udp_port,
+            "position": state.position.to_dict(),
+            "rotation": state.rotation.to_dict(),
+            "velocity": state.velocity.to_dict(),
+            "acceleration": state.acceleration.to_dict(),
+            "is_flying": state.is_flying,
+            "is_connected": state.is_connected,
+            "flight_time": state.flight_time,
+            "battery": state.battery,
+            "temperature": state.temperature,
+            "barometer": state.barometer,
+            "mission_pad_id": state.mission_pad_id,
+            "mission_pad_x": state.mission_pad_x,
+            "mission_pad_y": state.mission_pad_y,
+            "mission_pad_z": state.mission_pad_z,
+            "speed": state.speed,
+            "rc_values": state.rc_values,
+            "last_command_time": state.last_command_time,
+            "last_update_time": state.last_update_time
+        }
+    
     async def send_state_to_backend(self):
         """Send current drone state to backend server"""
         if not self.http_session:
             return
         
         try:
-            # Prepare state data for backend
-            state_data = {
-                "udp_port": self.state.udp_port,
-                "position": {
-                    "x": self.state.position.x,
-                    "y": self.state.position.y,
-                    "z": self.state.position.z
-                },
-                "rotation": {
-                    "x": self.state.rotation.x,
-                    "y": self.state.rotation.y,
-                    "z": self.state.rotation.z
-                },
-                "velocity": {
-                    "x": self.state.velocity.x,
-                    "y": self.state.velocity.y,
-                    "z": self.state.velocity.z
-                },
-                "acceleration": {
-                    "x": self.state.acceleration.x,
-                    "y": self.state.acceleration.y,
-                    "z": self.state.acceleration.z
-                },
-                "is_flying": self.state.is_flying,
-                "is_connected": self.state.is_connected,
-                "flight_time": self.state.flight_time,
-                "battery": self.state.battery,
-                "temperature": self.state.temperature,
-                "barometer": self.state.barometer,
-                "mission_pad_id": self.state.mission_pad_id,
-                "mission_pad_x": self.state.mission_pad_x,
-                "mission_pad_y": self.state.mission_pad_y,
-                "mission_pad_z": self.state.mission_pad_z,
-                "speed": self.state.speed,
-                "rc_values": self.state.rc_values,
-                "last_command_time": self.state.last_command_time,
-                "last_update_time": self.state.last_update_time
-            }
+            state_data = self.get_backend_state()
             
             # Send POST request to backend
             url = f"{self.backend_url}/api/drones/{self.drone_id}/state"
@@ -907,20 +943,14 @@ class MockDrone:
             
             while self.running:
                 try:
-                    # Format state packet
-                    state_packet = self.format_state_packet()
+                    # Format and encode the state packet once for both destinations
+                    state_packet = self.format_state_packet().encode('ascii')
                     
                     # Broadcast to all connected clients (broadcast to local network)
-                    state_socket.sendto(
-                        state_packet.encode('utf-8'),
-                        ('255.255.255.255', 8890)
-                    )
+                    state_socket.sendto(state_packet, ('255.255.255.255', 8890))
                     
                     # Also send to localhost for local testing
-                    state_socket.sendto(
-                        state_packet.encode('utf-8'),
-                        ('127.0.0.1', 8890)
-                    )
+                    state_socket.sendto(state_packet, ('127.0.0.1', 8890))
                     
                     # Send at 10Hz (every 100ms)
                     await asyncio.sleep(0.1)
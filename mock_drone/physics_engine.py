@@ -3,28 +3,36 @@ Physics simulation engine for realistic drone movement and behavior
 """
 import math
 import time
-from typing import Tuple, Optional
+from typing import Callable, List, Tuple, Optional
 import asyncio
-import sys
-import os
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
 
 from backend.models import DroneState, Vector3, SimulationConfig
 
 
+def _normalize_xyz(x: float, y: float, z: float) -> Tuple[float, float, float]:
+    """Scale (x, y, z) to unit length; the zero vector stays zero"""
+    length = math.hypot(x, y, z)
+    if length == 0:
+        return 0.0, 0.0, 0.0
+    return x / length, y / length, z / length
+
+
 class PhysicsEngine:
     """Handles realistic physics simulation for drone movement"""
     
-    def __init__(self, config: SimulationConfig):
+    def __init__(self, config: SimulationConfig, clock: Callable[[], float] = time.time):
         self.config = config
-        self.last_update_time = time.time()
+        self.clock = clock  # times animations; tests inject a manual clock
+        self.last_update_time = clock()
         
         # Physics constants
         self.gravity = config.gravity  # m/s²
+        self.gravity_cm = config.gravity * 100.0  # cm/s²
         self.air_resistance = config.air_resistance
         self.max_acceleration = config.max_acceleration  # cm/s²
+        self.half_bounds = tuple(bound / 2 for bound in config.scene_bounds)
         
         # Movement parameters
         self.takeoff_speed = 50  # cm/s
@@ -67,7 +75,74 @@ class PhysicsEngine:
         # The drone should only land when explicitly commanded or when landing animation completes
         
         # Update timestamps
-        drone_state.last_update_time = time.time()
+        drone_state.last_update_time = self.clock()
+    
+    def update_all_drones(self, drone_states: List[DroneState], dt: float) -> None:
+        """Update physics for a whole swarm of drones in one pass
+        
+        Same result as calling update_drone_physics on each drone: animations
+        still step per drone, while gravity, air resistance, boundaries and
+        integration run as array operations over all drones at once.
+        """
+        if not drone_states:
+            return
+        
+        for drone_state in drone_states:
+            if drone_state.drone_id in self.animations:
+                self._update_animation(drone_state, dt)
+        
+        # Vector buffers for all drones, shape (N, 12)
+        buffers = np.stack([d._buf for d in drone_states])
+        position = buffers[:, 0:3]
+        velocity = buffers[:, 3:6]
+        z = position[:, 2]
+        
+        animation_types = [self.animations.get(d.drone_id, {}).get('type') for d in drone_states]
+        is_flying = np.array([d.is_flying for d in drone_states], dtype=bool)
+        is_animating = np.array([t is not None for t in animation_types], dtype=bool)
+        is_rotating = np.array([t == 'rotation' for t in animation_types], dtype=bool)
+        is_landing = np.array([t == 'landing' for t in animation_types], dtype=bool)
+        controls_z = np.array(
+            [t in ('takeoff', 'landing', 'linear', 'curve', 'flip') for t in animation_types], dtype=bool
+        )
+        
+        # Gravity with hover stabilization (see _apply_gravity)
+        gravity_cm = self.gravity_cm
+        falling = is_flying & ~controls_z
+        velocity[falling, 2] -= gravity_cm * dt
+        hovering = falling & is_rotating
+        velocity[hovering, 2] += (self.hover_height - z[hovering]) * 2.0 * dt
+        holding = falling & ~is_animating & (z > 0)
+        held_z = z[holding]
+        velocity[holding, 2] += ((np.maximum(held_z, self.hover_height) - held_z) * 1.5 + gravity_cm) * dt
+        
+        # Air resistance
+        velocity *= max(0.0, 1.0 - (self.air_resistance * dt))
+        
+        # Scene boundaries
+        bounds = self.config.scene_bounds
+        half_xy = np.array(self.half_bounds[:2])
+        outside_xy = np.abs(position[:, :2]) > half_xy
+        np.clip(position[:, :2], -half_xy, half_xy, out=position[:, :2])
+        velocity[:, :2][outside_xy] = 0
+        above = z > bounds[2]
+        position[above, 2] = bounds[2]
+        velocity[above, 2] = 0
+        
+        position += velocity * dt
+        
+        # Ground contact
+        below = z < 0
+        position[below, 2] = 0
+        velocity[below, 2] = 0
+        landed = below & is_flying & is_landing
+        
+        now = self.clock()
+        for drone_state, buffer, has_landed in zip(drone_states, buffers, landed.tolist()):
+            drone_state._buf[:] = buffer
+            if has_landed:
+                drone_state.is_flying = False
+            drone_state.last_update_time = now
     
     def start_takeoff_animation(self, drone_state: DroneState) -> None:
         """Start takeoff animation"""
@@ -76,12 +151,8 @@ class PhysicsEngine:
         
         self.animations[drone_state.drone_id] = {
             'type': 'takeoff',
-            'start_time': time.time(),
-            'start_position': Vector3(
-                drone_state.position.x,
-                drone_state.position.y,
-                drone_state.position.z
-            ),
+            'start_time': self.clock(),
+            'start_position': Vector3(*drone_state.position.as_tuple()),
             'target_height': self.hover_height,
             'duration': max(self.hover_height / self.takeoff_speed, 0.1)
         }
@@ -95,12 +166,8 @@ class PhysicsEngine:
         
         self.animations[drone_state.drone_id] = {
             'type': 'landing',
-            'start_time': time.time(),
-            'start_position': Vector3(
-                drone_state.position.x,
-                drone_state.position.y,
-                drone_state.position.z
-            ),
+            'start_time': self.clock(),
+            'start_position': Vector3(*drone_state.position.as_tuple()),
             'target_height': 0,
             'duration': max(drone_state.position.z / self.landing_speed, 0.1)
         }
@@ -117,12 +184,8 @@ class PhysicsEngine:
         
         self.animations[drone_state.drone_id] = {
             'type': animation_type,
-            'start_time': time.time(),
-            'start_position': Vector3(
-                drone_state.position.x,
-                drone_state.position.y,
-                drone_state.position.z
-            ),
+            'start_time': self.clock(),
+            'start_position': Vector3(*drone_state.position.as_tuple()),
             'target_position': target_position,
             'duration': duration,
             'speed': speed
@@ -145,17 +208,9 @@ class PhysicsEngine:
         
         self.animations[drone_state.drone_id] = {
             'type': 'flip',
-            'start_time': time.time(),
-            'start_position': Vector3(
-                drone_state.position.x,
-                drone_state.position.y,
-                drone_state.position.z
-            ),
-            'start_rotation': Vector3(
-                drone_state.rotation.x,
-                drone_state.rotation.y,
-                drone_state.rotation.z
-            ),
+            'start_time': self.clock(),
+            'start_position': Vector3(*drone_state.position.as_tuple()),
+            'start_rotation': Vector3(*drone_state.rotation.as_tuple()),
             'axis': rotation_axis.get(direction, 'y'),
             'rotation_amount': rotation_amount,
             'duration': 1.0  # 1 second flip
@@ -169,7 +224,7 @@ class PhysicsEngine:
             
         self.animations[drone_state.drone_id] = {
             'type': 'rotation',
-            'start_time': time.time(),
+            'start_time': self.clock(),
             'start_yaw': drone_state.rotation.z,
             'target_yaw': target_yaw,
             'duration': max(abs(target_yaw - drone_state.rotation.z) / 90.0, 0.1),  # 90 deg/sec, min 0.1s
@@ -181,7 +236,7 @@ class PhysicsEngine:
         drone_id = drone_state.drone_id
         animation = self.animations[drone_id]
         
-        current_time = time.time()
+        current_time = self.clock()
         elapsed_time = current_time - animation['start_time']
         progress = min(elapsed_time / max(animation['duration'], 0.001), 1.0)
         
@@ -233,25 +288,24 @@ class PhysicsEngine:
         """Update linear movement animation"""
         smooth_progress = self._smooth_step(progress)
         
-        start_pos = animation['start_position']
-        target_pos = animation['target_position']
+        # Work on plain floats; each Vector3 component access is an array lookup
+        sx, sy, sz = animation['start_position'].as_tuple()
+        tx, ty, tz = animation['target_position'].as_tuple()
         
-        drone_state.position.x = start_pos.x + (target_pos.x - start_pos.x) * smooth_progress
-        drone_state.position.y = start_pos.y + (target_pos.y - start_pos.y) * smooth_progress
-        drone_state.position.z = start_pos.z + (target_pos.z - start_pos.z) * smooth_progress
+        x = sx + (tx - sx) * smooth_progress
+        y = sy + (ty - sy) * smooth_progress
+        z = sz + (tz - sz) * smooth_progress
+        drone_state.position.set(x, y, z)
         
         # Calculate velocity
         if progress < 1.0:
-            remaining_distance = self._calculate_distance(drone_state.position, target_pos)
+            dx, dy, dz = tx - x, ty - y, tz - z
+            remaining_distance = math.hypot(dx, dy, dz)
             remaining_time = animation['duration'] * (1 - progress)
             if remaining_time > 0:
                 speed = remaining_distance / remaining_time
-                direction = self._normalize_vector(Vector3(
-                    target_pos.x - drone_state.position.x,
-                    target_pos.y - drone_state.position.y,
-                    target_pos.z - drone_state.position.z
-                ))
-                drone_state.velocity = direction * speed
+                nx, ny, nz = _normalize_xyz(dx, dy, dz)
+                drone_state.velocity.set(nx * speed, ny * speed, nz * speed)
     
     def _update_curve_movement(self, drone_state: DroneState, animation: dict, progress: float) -> None:
         """Update curve movement animation using Bezier curve"""
@@ -264,9 +318,15 @@ class PhysicsEngine:
         # Cubic Bezier interpolation
         t = self._smooth_step(progress)
         
-        drone_state.position.x = self._cubic_bezier(t, p0.x, p1.x, p2.x, p3.x)
-        drone_state.position.y = self._cubic_bezier(t, p0.y, p1.y, p2.y, p3.y)
-        drone_state.position.z = self._cubic_bezier(t, p0.z, p1.z, p2.z, p3.z)
+        x0, y0, z0 = p0.as_tuple()
+        x1, y1, z1 = p1.as_tuple()
+        x2, y2, z2 = p2.as_tuple()
+        x3, y3, z3 = p3.as_tuple()
+        drone_state.position.set(
+            self._cubic_bezier(t, x0, x1, x2, x3),
+            self._cubic_bezier(t, y0, y1, y2, y3),
+            self._cubic_bezier(t, z0, z1, z2, z3),
+        )
     
     def _update_flip_animation(self, drone_state: DroneState, animation: dict, progress: float) -> None:
         """Update flip animation"""
@@ -286,9 +346,8 @@ class PhysicsEngine:
             drone_state.rotation.z = start_rotation.z + rotation_amount * flip_progress
         
         # Maintain original position during flip with slight vertical movement for realism
-        drone_state.position.x = start_position.x
-        drone_state.position.y = start_position.y
-        drone_state.position.z = start_position.z + 20 * math.sin(progress * math.pi)
+        sx, sy, sz = start_position.as_tuple()
+        drone_state.position.set(sx, sy, sz + 20 * math.sin(progress * math.pi))
         
         # Reset velocity to prevent gravity/physics from interfering with flip position
         drone_state.velocity = Vector3(0, 0, 0)
@@ -328,11 +387,7 @@ class PhysicsEngine:
         elif animation['type'] == 'flip':
             # Reset rotation after flip
             start_rotation = animation['start_rotation']
-            drone_state.rotation = Vector3(
-                start_rotation.x,
-                start_rotation.y,
-                start_rotation.z
-            )
+            drone_state.rotation = Vector3(*start_rotation.as_tuple())
     
     def _apply_gravity(self, drone_state: DroneState, dt: float) -> None:
         """Apply gravity effect"""
@@ -345,8 +400,7 @@ class PhysicsEngine:
             if animation['type'] in ['takeoff', 'landing', 'linear', 'curve', 'flip']:
                 return  # These animations control Z position directly
         
-        # Convert gravity from m/s² to cm/s²
-        gravity_cm = self.gravity * 100
+        gravity_cm = self.gravity_cm
         
         # Apply gravity to vertical velocity
         drone_state.velocity.z -= gravity_cm * dt
@@ -385,21 +439,22 @@ class PhysicsEngine:
     def _apply_boundary_constraints(self, drone_state: DroneState) -> None:
         """Apply scene boundary constraints"""
         bounds = self.config.scene_bounds
+        half_x, half_y, _ = self.half_bounds
         
         # X boundaries
-        if drone_state.position.x < -bounds[0] / 2:
-            drone_state.position.x = -bounds[0] / 2
+        if drone_state.position.x < -half_x:
+            drone_state.position.x = -half_x
             drone_state.velocity.x = 0
-        elif drone_state.position.x > bounds[0] / 2:
-            drone_state.position.x = bounds[0] / 2
+        elif drone_state.position.x > half_x:
+            drone_state.position.x = half_x
             drone_state.velocity.x = 0
         
         # Y boundaries
-        if drone_state.position.y < -bounds[1] / 2:
-            drone_state.position.y = -bounds[1] / 2
+        if drone_state.position.y < -half_y:
+            drone_state.position.y = -half_y
             drone_state.velocity.y = 0
-        elif drone_state.position.y > bounds[1] / 2:
-            drone_state.position.y = bounds[1] / 2
+        elif drone_state.position.y > half_y:
+            drone_state.position.y = half_y
             drone_state.velocity.y = 0
         
         # Z boundaries
@@ -409,17 +464,11 @@ class PhysicsEngine:
     
     def _calculate_distance(self, pos1: Vector3, pos2: Vector3) -> float:
         """Calculate 3D distance between two positions"""
-        dx = pos2.x - pos1.x
-        dy = pos2.y - pos1.y
-        dz = pos2.z - pos1.z
-        return math.sqrt(dx*dx + dy*dy + dz*dz)
+        return math.dist(pos1.as_tuple(), pos2.as_tuple())
     
     def _normalize_vector(self, vector: Vector3) -> Vector3:
         """Normalize a vector to unit length"""
-        length = math.sqrt(vector.x*vector.x + vector.y*vector.y + vector.z*vector.z)
-        if length == 0:
-            return Vector3()
-        return Vector3(vector.x/length, vector.y/length, vector.z/length)
+        return Vector3(*_normalize_xyz(*vector.as_tuple()))
     
     def _smooth_step(self, t: float) -> float:
         """Smooth step function for easing"""
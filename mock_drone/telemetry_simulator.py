@@ -1,40 +1,78 @@
 """
 Telemetry data simulation for realistic sensor readings and drone state information
 """
-import random
 import math
-import time
-from typing import Tuple, Optional
-import sys
-import os
+from typing import Tuple, Optional, List
+import numpy as np
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.models import DroneState, Vector3, SimulationConfig, VECTOR_FIELD_OFFSETS
 
-from backend.models import DroneState, Vector3, SimulationConfig
+
+# Tello state packet; every field is an integer, formatted in one % operation
+_TELLO_STATE_TEMPLATE = (
+    "mid:%d;x:%d;y:%d;z:%d;"
+    "mpry:%d;%d;%d;"
+    "vgx:%d;vgy:%d;vgz:%d;"
+    "templ:%d;temph:%d;"
+    "tof:%d;h:%d;bat:%d;baro:%d;"
+    "time:%d;"
+    "agx:%d;agy:%d;agz:%d;"
+)
+
+
+# DroneState._buf indices of the reported vectors: rotation (pitch, roll, yaw),
+# velocity (vgx, vgy, vgz) and acceleration (agx, agy, agz)
+_REPORTED_VECTOR_INDEX = np.concatenate([
+    np.arange(VECTOR_FIELD_OFFSETS[field], VECTOR_FIELD_OFFSETS[field] + 3)
+    for field in ('rotation', 'velocity', 'acceleration')
+])
+
+
+# Pad coordinates are bounded by the scene size, well within float32 precision
+_MISSION_PAD_DTYPE = np.dtype([('id', np.int64), ('x', np.float32), ('y', np.float32), ('z', np.float32)])
+
+
+# Sensor type -> (DroneState attribute, reading written when that sensor fails).
+# Vector readings are copied into the drone's buffer, so sharing one is safe.
+_SENSOR_FAILURES = {
+    "battery": ("battery", 0),
+    "temperature": ("temperature", -1),  # Invalid reading
+    "barometer": ("barometer", -1),
+    "mission_pad": ("mission_pad_id", -1),
+    "acceleration": ("acceleration", Vector3(0, 0, 0)),
+}
 
 
 class TelemetrySimulator:
     """Generates realistic telemetry data for simulated drone sensors"""
     
-    def __init__(self, config: SimulationConfig):
+    def __init__(self, config: SimulationConfig, seed: Optional[int] = None):
         self.config = config
         
+        # Per-simulator generator for all randomness; seed it for reproducible runs
+        self._rng = np.random.default_rng(seed)
+        
         # Telemetry parameters
         self.base_temperature = 25  # Base temperature in Celsius
         self.temperature_variance = 5  # Temperature variance range
-        self.battery_start_time = time.time()
         self.initial_battery = 100
         
         # Mission pad simulation
         self.mission_pads = self._initialize_mission_pads()
+        self._pad_table_dirty = True
         self.mission_pad_detection_range = 200  # cm
+        self.mission_pad_min_altitude = 20  # cm
+        self.mission_pad_max_altitude = 300  # cm
         
         # Sensor noise parameters
         self.position_noise = 2.0  # cm
         self.velocity_noise = 1.0  # cm/s
         self.rotation_noise = 1.0  # degrees
         self.acceleration_noise = 5.0  # cm/s²
+        self._noise_amplitudes = None  # amplitudes _noise_scale was built from
+        
+        # Battery drain per second of simulated time (config is frozen)
+        self._drain_per_second = config.battery_drain_rate / 60.0  # %/minute to %/second
         
         # Barometer simulation
         self.sea_level_pressure = 1013.25  # hPa
@@ -53,162 +91,242 @@ class TelemetrySimulator:
             8: Vector3(-200, 0, 0)
         }
     
+    @property
+    def mission_pad_detection_range(self) -> int:
+        """Mission pad detection range in cm"""
+        return self._detection_range
+    
+    @mission_pad_detection_range.setter
+    def mission_pad_detection_range(self, range_cm: int) -> None:
+        # Detection compares squared distances, so keep the squared range in step
+        self._detection_range = range_cm
+        self._detection_range_sq = range_cm * range_cm
+    
+    def _mission_pad_table(self) -> np.ndarray:
+        """Mission pads as a structured (id, x, y, z) array for detection
+        
+        Rebuilt from mission_pads on first use after it changes.
+        """
+        if self._pad_table_dirty:
+            self._pad_table = np.array(
+                [(pad_id, *position.as_tuple()) for pad_id, position in self.mission_pads.items()],
+                dtype=_MISSION_PAD_DTYPE,
+            )
+            self._pad_table_dirty = False
+        return self._pad_table
+    
     def update_telemetry(self, drone_state: DroneState, dt: float) -> None:
         """Update all telemetry data for the drone"""
-        self._update_battery(drone_state, dt)
-        self._update_temperature(drone_state)
-        self._update_barometer(drone_state)
-        self._update_acceleration(drone_state, dt)
+        self._update_sensors(drone_state, dt)
         self._update_mission_pad_detection(drone_state)
-        self._add_sensor_noise(drone_state)
     
-    def _update_battery(self, drone_state: DroneState, dt: float) -> None:
-        """Update battery level based on usage"""
-        if drone_state.battery <= 0:
+    def update_telemetry_batch(self, drone_states: List[DroneState], dt: float) -> None:
+        """Update telemetry data for a whole swarm of drones in one pass"""
+        if not drone_states:
             return
         
-        # Base drain rate
-        base_drain = self.config.battery_drain_rate * (dt / 60.0)  # per minute to per second
-        
-        # Additional drain based on activity
-        activity_multiplier = 1.0
-        
-        if drone_state.is_flying:
-            activity_multiplier += 0.5  # Flying uses more battery
-        
-        # Movement increases battery drain
-        velocity_magnitude = math.sqrt(
-            drone_state.velocity.x**2 + 
-            drone_state.velocity.y**2 + 
-            drone_state.velocity.z**2
+        # Velocity magnitudes for all drones at once, shape (N,)
+        velocities = np.stack([d._buf[3:6] for d in drone_states])
+        velocity_magnitudes = np.sqrt(np.einsum('ij,ij->i', velocities, velocities))
+        
+        # Battery first, as an emergency landing changes the drone position
+        self._update_battery_batch(drone_states, dt, velocity_magnitudes)
+        
+        # Post-battery state for all drones: vector buffers (N, 12) and flags
+        buffers = np.stack([d._buf for d in drone_states])
+        positions = buffers[:, 0:3]
+        altitudes = positions[:, 2]
+        is_flying = np.array([d.is_flying for d in drone_states], dtype=bool)
+        batteries = np.array([d.battery for d in drone_states], dtype=float)
+        
+        temperatures = self._temperature_batch(altitudes, is_flying, batteries).tolist()
+        barometers = np.maximum(
+            altitudes.astype(np.int64) + self._rng.integers(-5, 6, len(drone_states)), 0
+        ).tolist()
+        if dt > 0:
+            accelerations = self._acceleration_batch(buffers[:, 6:9], velocity_magnitudes, is_flying)
+        else:
+            accelerations = buffers[:, 6:9]
+        
+        # Mission pad detection against all pads at once, shape (N, M)
+        count = len(drone_states)
+        pads = self._mission_pad_table()
+        if not pads.size:
+            detected = np.zeros(count, dtype=bool)
+            pad_ids = np.full(count, -1)
+            offsets_xy = np.zeros((count, 2))
+        else:
+            dx = positions[:, 0, None] - pads['x']
+            dy = positions[:, 1, None] - pads['y']
+            distances_sq = dx * dx + dy * dy
+            rows = np.arange(count)
+            closest = distances_sq.argmin(axis=1)
+            detected = (
+                (distances_sq[rows, closest] < self._detection_range_sq) &
+                (altitudes >= self.mission_pad_min_altitude) &
+                (altitudes <= self.mission_pad_max_altitude)
+            )
+            pad_ids = np.where(detected, pads['id'][closest], -1)
+            offsets_xy = np.stack([dx[rows, closest], dy[rows, closest]], axis=1)
+        
+        # Position relative to the detected pad with detection noise, -100 for none
+        # (see _apply_mission_pad_detection)
+        pad_readings = np.column_stack([offsets_xy, altitudes]).astype(np.int64)
+        pad_readings += self._rng.integers((-5, -5, -3), (6, 6, 4), size=(count, 3))
+        pad_readings = np.where(detected[:, None], pad_readings, -100)
+        
+        for drone_state, temperature, barometer, acceleration, pad_id, pad_reading in zip(
+                drone_states, temperatures, barometers, accelerations,
+                pad_ids.tolist(), pad_readings.tolist()):
+            drone_state.temperature = temperature
+            drone_state.barometer = barometer
+            drone_state._buf[6:9] = acceleration
+            drone_state.mission_pad_id = pad_id
+            drone_state.mission_pad_x, drone_state.mission_pad_y, drone_state.mission_pad_z = pad_reading
+    
+    def _temperature_batch(self, altitudes: np.ndarray, is_flying: np.ndarray,
+                           batteries: np.ndarray) -> np.ndarray:
+        """Temperatures for many drones at once, as _update_sensors computes for one"""
+        count = len(altitudes)
+        base_temp = self.base_temperature + self._rng.uniform(-2, 2, count)
+        base_temp += np.where(is_flying, self._rng.uniform(2, 8, count), 0.0)
+        final_temp = base_temp - 0.006 * altitudes + (batteries / 100.0) * 5
+        final_temp += self._rng.uniform(-1, 1, count)
+        return np.clip(final_temp.astype(np.int64), 0, 80)
+    
+    def _acceleration_batch(self, accelerations: np.ndarray, velocity_magnitudes: np.ndarray,
+                            is_flying: np.ndarray) -> np.ndarray:
+        """Smoothed accelerations (N, 3) for many drones, as _update_sensors computes for one"""
+        moving = (velocity_magnitudes > 5)[:, None]
+        limits = np.where(moving, (50.0, 50.0, 30.0), (10.0, 10.0, 5.0))
+        accel = self._rng.uniform(-limits, limits)
+        accel[:, 2] += np.where(is_flying, -981.0, 0.0)
+        smoothing_factor = 0.7
+        return smoothing_factor * accelerations + (1 - smoothing_factor) * accel
+    
+    def _update_battery_batch(self, drone_states: List[DroneState], dt: float,
+                              velocity_magnitudes: np.ndarray) -> None:
+        """Update battery levels for many drones at once, as _update_sensors does for one"""
+        batteries = np.array([d.battery for d in drone_states])
+        is_flying = np.array([d.is_flying for d in drone_states], dtype=bool)
+        
+        base_drain = self._drain_per_second * dt
+        activity_multiplier = (
+            1.0 + 0.5 * is_flying +
+            np.where(velocity_magnitudes > 10, velocity_magnitudes / 100.0, 0.0)
         )
-        if velocity_magnitude > 10:  # Moving faster than 10 cm/s
-            activity_multiplier += velocity_magnitude / 100.0
+        total_drain = base_drain * activity_multiplier * self._rng.uniform(0.8, 1.2, len(drone_states))
         
-        # Calculate total drain
-        total_drain = base_drain * activity_multiplier
-        
-        # Add some randomness
-        total_drain *= random.uniform(0.8, 1.2)
-        
-        # Update battery
-        drone_state.battery = max(0, int(drone_state.battery - total_drain))
+        # Drained batteries are left alone, as in _update_sensors
+        draining = batteries > 0
+        drained_levels = np.maximum(0, (batteries - total_drain).astype(np.int64))
+        levels = np.where(draining, drained_levels, batteries).tolist()
         
         # Emergency landing if battery is critically low
-        if drone_state.battery <= 5 and drone_state.is_flying:
-            drone_state.is_flying = False
-            drone_state.position.z = 0
-    
-    def _update_temperature(self, drone_state: DroneState) -> None:
-        """Update temperature based on activity and environment"""
-        # Base temperature with some variation
-        base_temp = self.base_temperature + random.uniform(-2, 2)
+        emergency = (draining & (drained_levels <= 5) & is_flying).tolist()
         
-        # Temperature increases with activity
-        if drone_state.is_flying:
-            base_temp += random.uniform(2, 8)
-        
-        # Altitude affects temperature (cooler at higher altitudes)
-        altitude_effect = -0.006 * drone_state.position.z  # 0.6°C per 100m
-        
-        # Battery level affects temperature (lower battery = cooler)
-        battery_effect = (drone_state.battery / 100.0) * 5
-        
-        # Calculate final temperature
-        final_temp = base_temp + altitude_effect + battery_effect
-        
-        # Add some noise and clamp to reasonable range
-        final_temp += random.uniform(-1, 1)
-        drone_state.temperature = max(0, min(80, int(final_temp)))
+        for drone_state, level, land in zip(drone_states, levels, emergency):
+            drone_state.battery = level
+            if land:
+                drone_state.is_flying = False
+                drone_state.position.z = 0
     
-    def _update_barometer(self, drone_state: DroneState) -> None:
-        """Update barometer reading based on altitude"""
-        # Convert altitude from cm to meters
-        altitude_m = drone_state.position.z / 100.0
-        
-        # Calculate pressure based on altitude
-        # Using simplified barometric formula
-        pressure = self.sea_level_pressure * math.exp(-altitude_m / 8400)
+    def _update_sensors(self, drone_state: DroneState, dt: float) -> None:
+        """Update battery, temperature, barometer and acceleration readings
+        
+        The drone state is read once into locals and each reading written back
+        once, rather than every sensor re-reading the vectors it needs.
+        """
+        rng = self._rng
+        z, vx, vy, vz, ax, ay, az = drone_state._buf[2:9].tolist()
+        velocity_magnitude = math.hypot(vx, vy, vz)
+        is_flying = drone_state.is_flying
+        battery = drone_state.battery
+        
+        # Battery drains faster when flying and when moving faster than 10 cm/s
+        if battery > 0:
+            activity_multiplier = 1.0
+            if is_flying:
+                activity_multiplier += 0.5
+            if velocity_magnitude > 10:
+                activity_multiplier += velocity_magnitude / 100.0
+            
+            # Calculate total drain, with some randomness
+            total_drain = self._drain_per_second * dt * activity_multiplier
+            total_drain *= rng.uniform(0.8, 1.2)
+            battery = max(0, int(battery - total_drain))
+            drone_state.battery = battery
+            
+            # Emergency landing if battery is critically low
+            if battery <= 5 and is_flying:
+                is_flying = False
+                z = 0.0
+                drone_state.is_flying = False
+                drone_state.position.z = 0
+        
+        # Temperature: base with some variation, warmer when flying, cooler at
+        # altitude (0.6°C per 100m) and with a lower battery
+        base_temp = self.base_temperature + rng.uniform(-2, 2)
+        if is_flying:
+            base_temp += rng.uniform(2, 8)
+        final_temp = base_temp - 0.006 * z + (battery / 100.0) * 5
         
-        # Convert to height in cm (barometer reading)
-        # This is a simplified conversion for simulation
-        barometer_height = int(altitude_m * 100)  # Convert back to cm
+        # Add some noise and clamp to reasonable range
+        final_temp += rng.uniform(-1, 1)
+        temperature = int(final_temp)
+        drone_state.temperature = 0 if temperature < 0 else (80 if temperature > 80 else temperature)
         
-        # Add some noise
-        barometer_height += random.randint(-5, 5)
+        # Barometer reports height in cm with some noise; the simulated pressure at
+        # that altitude (sea_level_pressure * exp(-altitude_m / 8400)) isn't reported
+        barometer_height = int(z) + int(rng.integers(-5, 6))
+        drone_state.barometer = barometer_height if barometer_height > 0 else 0
         
-        drone_state.barometer = max(0, barometer_height)
-    
-    def _update_acceleration(self, drone_state: DroneState, dt: float) -> None:
-        """Update acceleration readings based on movement"""
+        # Acceleration: a simplified IMU simulation, random values plus gravity
+        # when flying, larger when moving
         if dt <= 0:
             return
-        
-        # Calculate acceleration from velocity changes
-        # This is a simplified simulation - real drones would have IMU data
-        
-        # Gravity component (always present when flying)
-        gravity_z = -981 if drone_state.is_flying else 0  # cm/s² (gravity)
-        
-        # Movement acceleration (simplified)
-        velocity_magnitude = math.sqrt(
-            drone_state.velocity.x**2 + 
-            drone_state.velocity.y**2 + 
-            drone_state.velocity.z**2
-        )
-        
-        # Simulate acceleration based on movement
-        if velocity_magnitude > 5:  # Moving
-            # Random acceleration values during movement
-            accel_x = random.uniform(-50, 50)
-            accel_y = random.uniform(-50, 50)
-            accel_z = random.uniform(-30, 30) + gravity_z
+        gravity_z = -981 if is_flying else 0  # cm/s²
+        if velocity_magnitude > 5:
+            accel_x, accel_y, accel_z = rng.uniform((-50, -50, -30), (50, 50, 30)).tolist()
         else:  # Hovering or stationary
-            # Small random values for hovering
-            accel_x = random.uniform(-10, 10)
-            accel_y = random.uniform(-10, 10)
-            accel_z = random.uniform(-5, 5) + gravity_z
+            accel_x, accel_y, accel_z = rng.uniform((-10, -10, -5), (10, 10, 5)).tolist()
+        accel_z += gravity_z
         
         # Update acceleration with some smoothing
         smoothing_factor = 0.7
-        drone_state.acceleration.x = (
-            smoothing_factor * drone_state.acceleration.x + 
-            (1 - smoothing_factor) * accel_x
-        )
-        drone_state.acceleration.y = (
-            smoothing_factor * drone_state.acceleration.y + 
-            (1 - smoothing_factor) * accel_y
-        )
-        drone_state.acceleration.z = (
-            smoothing_factor * drone_state.acceleration.z + 
-            (1 - smoothing_factor) * accel_z
+        blend = 1 - smoothing_factor
+        drone_state.acceleration.set(
+            smoothing_factor * ax + blend * accel_x,
+            smoothing_factor * ay + blend * accel_y,
+            smoothing_factor * az + blend * accel_z,
         )
     
     def _update_mission_pad_detection(self, drone_state: DroneState) -> None:
         """Update mission pad detection based on drone position"""
         closest_pad_id = -1
-        closest_distance = float('inf')
-        closest_pad_pos = None
-        
-        # Check distance to all mission pads
-        for pad_id, pad_position in self.mission_pads.items():
-            # Calculate 2D distance (mission pads are on the ground)
-            distance = math.sqrt(
-                (drone_state.position.x - pad_position.x)**2 + 
-                (drone_state.position.y - pad_position.y)**2
-            )
-            
-            # Check if within detection range and altitude is reasonable
-            if (distance < self.mission_pad_detection_range and 
-                20 <= drone_state.position.z <= 300):  # Reasonable detection altitude
-                
-                if distance < closest_distance:
-                    closest_distance = distance
-                    closest_pad_id = pad_id
-                    closest_pad_pos = pad_position
-        
-        # Update mission pad detection
+        
+        # Only detect pads from a reasonable altitude; checked before touching the pad table
+        px, py, pz = drone_state.position.as_tuple()
+        pads = (self._mission_pad_table()
+                if self.mission_pad_min_altitude <= pz <= self.mission_pad_max_altitude else None)
+        if pads is not None and pads.size:
+            # Squared 2D distances to all pads at once (mission pads are on the ground).
+            # px/py are Python floats, which don't promote float32 under NEP 50,
+            # so widen the pad columns to keep the distance maths in float64
+            dx = pads['x'].astype(np.float64) - px
+            dy = pads['y'].astype(np.float64) - py
+            distances_sq = dx * dx + dy * dy
+            closest = distances_sq.argmin()
+            if distances_sq[closest] < self._detection_range_sq:
+                closest_pad_id = int(pads['id'][closest])
+        
+        self._apply_mission_pad_detection(drone_state, closest_pad_id)
+    
+    def _apply_mission_pad_detection(self, drone_state: DroneState, closest_pad_id: int) -> None:
+        """Write the detected mission pad (or -1 for none) into the drone state"""
         if closest_pad_id != -1:
+            closest_pad_pos = self.mission_pads[closest_pad_id]
+            
             drone_state.mission_pad_id = closest_pad_id
             
             # Calculate relative position to mission pad
@@ -217,9 +335,10 @@ class TelemetrySimulator:
             drone_state.mission_pad_z = int(drone_state.position.z)
             
             # Add some detection noise
-            drone_state.mission_pad_x += random.randint(-5, 5)
-            drone_state.mission_pad_y += random.randint(-5, 5)
-            drone_state.mission_pad_z += random.randint(-3, 3)
+            noise_x, noise_y, noise_z = self._rng.integers((-5, -5, -3), (6, 6, 4)).tolist()
+            drone_state.mission_pad_x += noise_x
+            drone_state.mission_pad_y += noise_y
+            drone_state.mission_pad_z += noise_z
         else:
             # No mission pad detected
             drone_state.mission_pad_id = -1
@@ -227,16 +346,13 @@ class TelemetrySimulator:
             drone_state.mission_pad_y = -100
             drone_state.mission_pad_z = -100
     
-    def _add_sensor_noise(self, drone_state: DroneState) -> None:
-        """Add realistic sensor noise to readings"""
-        # NOTE: We don't add noise to actual position/velocity/rotation as this would cause
-        # unwanted movement. Instead, noise should be added only when reporting sensor values
-        # to external systems (like in get_tello_state_string method).
-        
-        # Only add noise to acceleration readings as these are sensor-specific
-        drone_state.acceleration.x += random.uniform(-self.acceleration_noise, self.acceleration_noise)
-        drone_state.acceleration.y += random.uniform(-self.acceleration_noise, self.acceleration_noise)
-        drone_state.acceleration.z += random.uniform(-self.acceleration_noise, self.acceleration_noise)
+    def _report_noise_scale(self) -> np.ndarray:
+        """Noise amplitude per reported component, rebuilt only when an amplitude changes"""
+        amplitudes = (self.rotation_noise, self.velocity_noise, self.acceleration_noise)
+        if amplitudes != self._noise_amplitudes:
+            self._noise_amplitudes = amplitudes
+            self._noise_scale = np.repeat(amplitudes, 3)
+        return self._noise_scale
     
     def get_tello_state_string(self, drone_state: DroneState) -> str:
         """Generate Tello state string with all telemetry data"""
@@ -248,23 +364,24 @@ class TelemetrySimulator:
         y = drone_state.mission_pad_y if mid != -2 else -200
         z = drone_state.mission_pad_z if mid != -2 else -200
         
-        # Attitude (pitch, roll, yaw) - add sensor noise only for reporting
-        pitch = int(drone_state.rotation.x + random.uniform(-self.rotation_noise, self.rotation_noise))
-        roll = int(drone_state.rotation.y + random.uniform(-self.rotation_noise, self.rotation_noise))
-        yaw = int(drone_state.rotation.z + random.uniform(-self.rotation_noise, self.rotation_noise))
-        
-        # Velocity - add sensor noise only for reporting
-        vgx = int(drone_state.velocity.x + random.uniform(-self.velocity_noise, self.velocity_noise))
-        vgy = int(drone_state.velocity.y + random.uniform(-self.velocity_noise, self.velocity_noise))
-        vgz = int(drone_state.velocity.z + random.uniform(-self.velocity_noise, self.velocity_noise))
+        # Attitude, velocity and acceleration gathered from the state buffer and
+        # given sensor noise in one array operation, only for reporting
+        noise_scale = self._report_noise_scale()
+        reported = drone_state._buf[_REPORTED_VECTOR_INDEX] + self._rng.uniform(-noise_scale, noise_scale)
+        (pitch, roll, yaw, vgx, vgy, vgz,
+         agx, agy, agz) = reported.astype(np.int64).tolist()
         
         # Temperature (low and high - simulate dual sensors)
         templ = drone_state.temperature
-        temph = drone_state.temperature + random.randint(-2, 2)
+        temph = drone_state.temperature + int(self._rng.integers(-2, 3))
         
         # Time of flight sensor (distance to ground) - add sensor noise
-        tof_base = max(30, int(drone_state.position.z))
-        tof = max(30, tof_base + random.randint(-3, 3))  # Minimum 30cm reading with noise
+        tof_base = int(drone_state.position.z)
+        if tof_base < 30:
+            tof_base = 30
+        tof = tof_base + int(self._rng.integers(-3, 4))
+        if tof < 30:
+            tof = 30  # Minimum 30cm reading with noise
         
         # Height (barometer)
         h = drone_state.barometer
@@ -274,50 +391,35 @@ class TelemetrySimulator:
         
         # Barometer (pressure altitude) - add sensor noise
         baro_base = int(drone_state.position.z * 0.83)
-        baro = max(0, baro_base + random.randint(-5, 5))  # Simplified conversion with noise
+        baro = baro_base + int(self._rng.integers(-5, 6))  # Simplified conversion with noise
+        if baro < 0:
+            baro = 0
         
         # Flight time
         flight_time = drone_state.flight_time
         
-        # Acceleration (already has noise added in _add_sensor_noise)
-        agx = int(drone_state.acceleration.x)
-        agy = int(drone_state.acceleration.y)
-        agz = int(drone_state.acceleration.z)
-        
-        # Build state string
-        state_string = (
-            f"mid:{mid};x:{x};y:{y};z:{z};"
-            f"mpry:{pitch};{roll};{yaw};"
-            f"vgx:{vgx};vgy:{vgy};vgz:{vgz};"
-            f"templ:{templ};temph:{temph};"
-            f"tof:{tof};h:{h};bat:{bat};baro:{baro};"
-            f"time:{flight_time};"
-            f"agx:{agx};agy:{agy};agz:{agz};"
+        return _TELLO_STATE_TEMPLATE % (
+            mid, x, y, z, pitch, roll, yaw, vgx, vgy, vgz, templ, temph,
+            tof, h, bat, baro, flight_time, agx, agy, agz,
         )
-        
-        return state_string
     
     def simulate_sensor_failure(self, drone_state: DroneState, sensor_type: str) -> None:
-        """Simulate sensor failures for testing"""
-        if sensor_type == "battery":
-            drone_state.battery = 0
-        elif sensor_type == "temperature":
-            drone_state.temperature = -1  # Invalid reading
-        elif sensor_type == "barometer":
-            drone_state.barometer = -1
-        elif sensor_type == "mission_pad":
-            drone_state.mission_pad_id = -1
-        elif sensor_type == "acceleration":
-            drone_state.acceleration = Vector3(0, 0, 0)
+        """Simulate sensor failures for testing; unknown sensor types are ignored"""
+        failure = _SENSOR_FAILURES.get(sensor_type)
+        if failure is not None:
+            attribute, value = failure
+            setattr(drone_state, attribute, value)
     
     def add_mission_pad(self, pad_id: int, position: Vector3) -> None:
         """Add a custom mission pad to the simulation"""
         self.mission_pads[pad_id] = position
+        self._pad_table_dirty = True
     
     def remove_mission_pad(self, pad_id: int) -> None:
         """Remove a mission pad from the simulation"""
         if pad_id in self.mission_pads:
             del self.mission_pads[pad_id]
+            self._pad_table_dirty = True
     
     def get_mission_pad_positions(self) -> dict:
         """Get all mission pad positions"""
@@ -330,4 +432,3 @@ class TelemetrySimulator:
     def reset_battery(self, drone_state: DroneState, level: int = 100) -> None:
         """Reset battery to specified level"""
         drone_state.battery = max(0, min(100, level))
-        self.battery_start_time = time.time()
\ No newline at end of file
@@ -4,27 +4,153 @@
 Multi-drone test to verify multiple mock drones work simultaneously
 """
 import sys
-import os
 import time
 import asyncio
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import atexit
+from concurrent.futures import ThreadPoolExecutor
 
-# Add djitellopy to path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Console output is written by a background thread in batches, so logging from
+# the flight sequence only costs a queue put instead of a stdout write + flush
+LOG_Q = queue.SimpleQueue()
+
+
+def _log_writer():
+    """Drain LOG_Q and write queued lines to stdout roughly every 20ms"""
+    while True:
+        batch = [LOG_Q.get()]
+        time.sleep(0.02)
+        try:
+            while True:
+                batch.append(LOG_Q.get_nowait())
+        except queue.Empty:
+            pass
+        sys.stdout.write(''.join(item for item in batch if isinstance(item, str)))
+        sys.stdout.flush()
+        for item in batch:
+            if isinstance(item, threading.Event):
+                item.set()
+
+
+def log(message=''):
+    """Queue a line for the background writer (drop-in for print)"""
+    LOG_Q.put(f"{message}\n")
+
+
+def flush_log():
+    """Block until everything logged so far has been written"""
+    done = threading.Event()
+    LOG_Q.put(done)
+    done.wait()
+
+
+threading.Thread(target=_log_writer, daemon=True).start()
+atexit.register(flush_log)
 
 try:
     from djitellopy import Tello
-    print("✓ djitellopy imported successfully")
+    log("✓ djitellopy imported successfully")
 except ImportError as e:
     print(f"✗ Failed to import djitellopy: {e}")
     sys.exit(1)
 
-def test_single_drone(drone_id, drone_ip, port):
-    """Test a single drone with specific movements"""
-    print(f"\n{'='*60}")
-    print(f"Testing Drone {drone_id} at {drone_ip}:{port}")
-    print(f"{'='*60}")
+# Movement pattern per drone, selected by drone number % 3: (name, icon, [(Tello method, argument), ...])
+PATTERNS = {
+    1: ('square', '📐', [('move_forward', 80), ('rotate_clockwise', 90)] * 4),
+    2: ('triangle', '🔺', [('move_forward', 100), ('rotate_clockwise', 120)] * 3),
+    0: ('vertical', '⬆️⬇️', [('move_up', 60), ('move_forward', 50), ('move_down', 60), ('move_back', 50)]),
+}
+
+
+# Worker threads for blocking djitellopy calls, resized by main() for the drone count.
+# Threads are only started on demand, so the default instance costs nothing.
+SHARED_EXEC = ThreadPoolExecutor(max_workers=8)
+
+
+async def _call(fn, *args, executor=None):
+    """Run a blocking djitellopy call without blocking the event loop
+    
+    Calls run on SHARED_EXEC unless another executor is given.
+    """
+    # run_in_executor skips the per-call context copy asyncio.to_thread makes
+    return await asyncio.get_running_loop().run_in_executor(executor or SHARED_EXEC, fn, *args)
+
+
+def _is_idle(state):
+    """True if a state packet reports no ground velocity"""
+    return bool(state) and state.get('vgx') == state.get('vgy') == state.get('vgz') == 0
+
+
+async def _wait_idle(tello, timeout=3.0, poll=0.1):
+    """Wait until the drone reports it has stopped moving, or until timeout
+    
+    The drone is considered idle once two consecutive state reads show zero
+    velocity at the same height.
+    """
+    deadline = time.monotonic_ns() + int(timeout * 1e9)
+    previous = None
+    while time.monotonic_ns() < deadline:
+        await asyncio.sleep(poll)
+        state = await _call(tello.get_current_state)
+        if _is_idle(state) and _is_idle(previous) and state.get('h') == previous.get('h'):
+            return True
+        previous = state
+    return False
+
+
+async def poll_all(drones):
+    """Read the current state of every drone concurrently"""
+    return await asyncio.gather(*[_call(drone['tello'].get_current_state) for drone in drones])
+
+
+# After this many connection failures across a multi-drone run, remaining drone
+# tests are skipped instead of each waiting out its own connect timeout.
+# test_multiple_drones sets the counter to 0; it stays None outside a multi-drone run.
+MAX_CONNECTION_FAILURES = 3
+_connection_failures = None
+
+
+def _record_connection_failure():
+    """Count a connection failure during a multi-drone run"""
+    global _connection_failures
+    if _connection_failures is not None:
+        _connection_failures += 1
+
+
+def _aborted():
+    """True once the run has seen too many connection failures"""
+    return _connection_failures is not None and _connection_failures >= MAX_CONNECTION_FAILURES
+
+
+def _with_summary_strings(results):
+    """Pre-join a result's action and error lists for the summary output"""
+    results['actions_str'] = ', '.join(results['completed_actions'])
+    results['errors_str'] = '; '.join(results['errors'])
+    return results
+
+
+async def test_single_drone(drone_id, drone_ip, port, drone_num=1, command_executor=None):
+    """Test a single drone with specific movements
+    
+    drone_num (1-based) selects the movement pattern from PATTERNS.
+    command_executor runs the drone's commands (default SHARED_EXEC); drones
+    sharing a host must share a single-worker executor so their responses
+    don't cross.
+    """
+    log(f"\n{'='*60}")
+    log(f"Testing Drone {drone_id} at {drone_ip}:{port}")
+    log(f"{'='*60}")
+    
+    # Build the per-drone line prefix once instead of on every log call
+    prefix = f"[{drone_id}] "
+    
+    def drone_log(message):
+        log(prefix + message)
+    
+    async def command(fn, *args):
+        """Send a drone command on the drone's command executor"""
+        return await _call(fn, *args, executor=command_executor)
     
     results = {
         'drone_id': drone_id,
@@ -33,302 +159,331 @@ def test_single_drone(drone_id, drone_ip, port):
         'completed_actions': []
     }
 
+    # Don't pile onto an outage: skip once enough drones failed to connect
+    if _aborted():
+        drone_log("⏭ Skipped: too many drones failed to connect")
+        results['errors'].append('skipped: too many connection failures')
+        return _with_summary_strings(results)
+
     try:
         # Create Tello instance with custom IP and port
-        print(f"[{drone_id}] Connecting to drone at {drone_ip}:{port}")
+        drone_log(f"Connecting to drone at {drone_ip}:{port}")
         tello = Tello(host=drone_ip, control_udp=port)
         results['completed_actions'].append('instance_created')
 
         # Try to connect
-        print(f"[{drone_id}] Attempting to connect...")
+        drone_log("Attempting to connect...")
         try:
-            tello.connect()
-            print(f"[{drone_id}] ✓ Connected to drone")
+            await command(tello.connect)
+            drone_log("✓ Connected to drone")
             results['completed_actions'].append('connected')
 
             # Get battery level
             try:
-                battery = tello.get_battery()
-                print(f"[{drone_id}] ✓ Battery level: {battery}%")
+                battery = await command(tello.get_battery)
+                drone_log(f"✓ Battery level: {battery}%")
                 results['completed_actions'].append('battery_check')
             except Exception as e:
-                print(f"[{drone_id}] ⚠ Could not get battery: {e}")
+                drone_log(f"⚠ Could not get battery: {e}")
                 results['errors'].append(f'battery_error: {e}')
 
             # Get current state
             try:
-                state = tello.get_current_state()
+                state = await _call(tello.get_current_state)
                 if state:
-                    print(f"[{drone_id}] ✓ State received: Battery {state.get('bat', 'N/A')}%, Height {state.get('h', 'N/A')}cm")
+                    drone_log(f"✓ State received: Battery {state.get('bat', 'N/A')}%, Height {state.get('h', 'N/A')}cm")
                     results['completed_actions'].append('state_check')
                 else:
-                    print(f"[{drone_id}] ⚠ No state data received")
+                    drone_log("⚠ No state data received")
             except Exception as e:
-                print(f"[{drone_id}] ⚠ Could not get state: {e}")
+                drone_log(f"⚠ Could not get state: {e}")
                 results['errors'].append(f'state_error: {e}')
             
             # Test movements if connected
-            if tello.get_current_state():
-                print(f"\n[{drone_id}] {'-'*40}")
-                print(f"[{drone_id}] Testing Flight Sequence")
-                print(f"[{drone_id}] {'-'*40}")
+            if _aborted():
+                drone_log("⏭ Skipping flight: too many drones failed to connect")
+                results['errors'].append('skipped: too many connection failures')
+            elif await _call(tello.get_current_state):
+                log()
+                drone_log('-'*40)
+                drone_log("Testing Flight Sequence")
+                drone_log('-'*40)
                 
                 try:
                     # Takeoff
-                    print(f"[{drone_id}] 🚁 Taking off...")
-                    tello.takeoff()
-                    time.sleep(2)
-                    print(f"[{drone_id}] ✓ Takeoff completed")
+                    drone_log("🚁 Taking off...")
+                    await command(tello.takeoff)
+                    await _wait_idle(tello)
+                    drone_log("✓ Takeoff completed")
                     results['completed_actions'].append('takeoff')
                     
                     # Different movement pattern for each drone
-                    drone_num = int(drone_id.split('_')[-1]) if '_' in drone_id else 1
-                    
-                    if drone_num % 3 == 1:
-                        # Square pattern
-                        print(f"[{drone_id}] 📐 Executing square pattern...")
-                        tello.move_forward(80)
-                        time.sleep(2)
-                        tello.rotate_clockwise(90)
-                        time.sleep(1)
-                        tello.move_forward(80)
-                        time.sleep(2)
-                        tello.rotate_clockwise(90)
-                        time.sleep(1)
-                        tello.move_forward(80)
-                        time.sleep(2)
-                        tello.rotate_clockwise(90)
-                        time.sleep(1)
-                        tello.move_forward(80)
-                        time.sleep(2)
-                        tello.rotate_clockwise(90)
-                        time.sleep(1)
-                        results['completed_actions'].append('square_pattern')
-                        
-                    elif drone_num % 3 == 2:
-                        # Triangle pattern
-                        print(f"[{drone_id}] 🔺 Executing triangle pattern...")
-                        tello.move_forward(100)
-                        time.sleep(2)
-                        tello.rotate_clockwise(120)
-                        time.sleep(1)
-                        tello.move_forward(100)
-                        time.sleep(2)
-                        tello.rotate_clockwise(120)
-                        time.sleep(1)
-                        tello.move_forward(100)
-                        time.sleep(2)
-                        tello.rotate_clockwise(120)
-                        time.sleep(1)
-                        results['completed_actions'].append('triangle_pattern')
-                        
-                    else:
-                        # Up-down pattern
-                        print(f"[{drone_id}] ⬆️⬇️ Executing vertical pattern...")
-                        tello.move_up(60)
-                        time.sleep(2)
-                        tello.move_forward(50)
-                        time.sleep(2)
-                        tello.move_down(60)
-                        time.sleep(2)
-                        tello.move_back(50)
-                        time.sleep(2)
-                        results['completed_actions'].append('vertical_pattern')
+                    pattern_name, icon, steps = PATTERNS[drone_num % 3]
+                    drone_log(f"{icon} Executing {pattern_name} pattern...")
+                    # Resolve bound methods and helpers once, outside the step loop
+                    moves = [(getattr(tello, method_name), argument) for method_name, argument in steps]
+                    call, wait_idle = command, _wait_idle
+                    for move, argument in moves:
+                        await call(move, argument)
+                        await wait_idle(tello)
+                    results['completed_actions'].append(f'{pattern_name}_pattern')
                     
                     # Get final state
-                    state = tello.get_current_state()
+                    state = await _call(tello.get_current_state)
                     if state:
-                        print(f"[{drone_id}] Final - Height: {state.get('h', 'N/A')}cm, Battery: {state.get('bat', 'N/A')}%")
+                        drone_log(f"Final - Height: {state.get('h', 'N/A')}cm, Battery: {state.get('bat', 'N/A')}%")
                     
                     # Land
-                    print(f"[{drone_id}] 🛬 Landing...")
-                    tello.land()
-                    time.sleep(2)
-                    print(f"[{drone_id}] ✓ Landing completed")
+                    drone_log("🛬 Landing...")
+                    await command(tello.land)
+                    await _wait_idle(tello)
+                    drone_log("✓ Landing completed")
                     results['completed_actions'].append('landing')
                     
-                    print(f"[{drone_id}] ✅ All flight tests completed successfully!")
+                    drone_log("✅ All flight tests completed successfully!")
                     results['success'] = True
                     
                 except Exception as e:
-                    print(f"[{drone_id}] ❌ Flight test failed: {e}")
+                    drone_log(f"❌ Flight test failed: {e}")
                     results['errors'].append(f'flight_error: {e}')
                     try:
-                        print(f"[{drone_id}] 🚨 Emergency landing...")
-                        tello.emergency()
+                        drone_log("🚨 Emergency landing...")
+                        await command(tello.emergency)
                         results['completed_actions'].append('emergency_landing')
                     except:
                         pass
 
         except Exception as e:
-            print(f"[{drone_id}] ✗ Connection failed: {e}")
+            drone_log(f"✗ Connection failed: {e}")
             results['errors'].append(f'connection_error: {e}')
+            _record_connection_failure()
 
     except Exception as e:
-        print(f"[{drone_id}] ✗ Test setup failed: {e}")
+        drone_log(f"✗ Test setup failed: {e}")
         results['errors'].append(f'setup_error: {e}')
     
-    return results
+    return _with_summary_strings(results)
+
+
+def _install_uvloop():
+    """Use the faster libuv-based event loop when available (not on Windows)"""
+    if sys.platform != 'win32':
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
 
 
-def test_multiple_drones(base_ip='127.0.0.1', start_port=8889, drone_count=3):
-    """Test multiple drones sequentially (djitellopy limitation prevents true parallel testing)"""
-    print(f"\n{'='*80}")
-    print(f"MULTI-DRONE TEST - Testing {drone_count} drones sequentially")
-    print(f"{'='*80}")
-    print("⚠️  Note: Testing sequentially due to djitellopy port binding limitations")
+async def test_multiple_drones(base_ip='127.0.0.1', start_port=8889, drone_count=3):
+    """Test multiple drones concurrently in this process
+    
+    djitellopy receives state for all drones on one process-wide socket, so
+    the drones share the process and their commands are fanned out per host.
+    """
+    global _connection_failures
+    log(f"\n{'='*80}")
+    log(f"MULTI-DRONE TEST - Testing {drone_count} drones concurrently")
+    log(f"{'='*80}")
     
     # Create drone configurations
     drone_configs = []
     for i in range(drone_count):
         drone_configs.append({
             'drone_id': f'drone_{i+1}',
-            'ip': base_ip,
-            'port': start_port + i
+            'drone_ip': base_ip,
+            'port': start_port + i,
+            'drone_num': i + 1
         })
     
-    print(f"Drone configurations:")
+    log(f"Drone configurations:")
     for config in drone_configs:
-        print(f"  - {config['drone_id']}: {config['ip']}:{config['port']}")
+        log(f"  - {config['drone_id']}: {config['drone_ip']}:{config['port']}")
     
-    # Test drones sequentially to avoid port conflicts
-    print(f"\n🚀 Starting sequential drone tests...")
-    start_time = time.time()
+    # Each drone spends almost all of its time waiting, so run them side by side
+    log(f"\n🚀 Starting concurrent drone tests...")
+    start_ns = time.monotonic_ns()
+    
+    # djitellopy keeps a single response queue per host, so drones on the same
+    # host take turns sending commands on one worker thread, while drones on
+    # different hosts overlap
+    _connection_failures = 0
+    host_executors = {config['drone_ip']: ThreadPoolExecutor(max_workers=1) for config in drone_configs}
+    try:
+        outcomes = await asyncio.gather(*[
+            test_single_drone(config['drone_id'], config['drone_ip'], config['port'], config['drone_num'],
+                              command_executor=host_executors[config['drone_ip']])
+            for config in drone_configs
+        ], return_exceptions=True)
+    finally:
+        _connection_failures = None
+        for executor in host_executors.values():
+            executor.shutdown(wait=True)
     
     results = []
-    for i, config in enumerate(drone_configs):
-        print(f"\n📍 Testing drone {i+1}/{drone_count}: {config['drone_id']}")
-        try:
-            result = test_single_drone(config['drone_id'], config['ip'], config['port'])
-            results.append(result)
-            print(f"✓ {config['drone_id']} test completed")
-            
-            # Small delay between drone tests to ensure clean disconnection
-            if i < len(drone_configs) - 1:
-                print(f"⏳ Waiting 2 seconds before next drone test...")
-                time.sleep(2)
-                
-        except Exception as e:
-            print(f"✗ {config['drone_id']} test failed with exception: {e}")
-            results.append({
+    for config, outcome in zip(drone_configs, outcomes):
+        if isinstance(outcome, Exception):
+            log(f"✗ {config['drone_id']} test failed with exception: {outcome}")
+            results.append(_with_summary_strings({
                 'drone_id': config['drone_id'],
                 'success': False,
-                'errors': [f'execution_error: {e}'],
+                'errors': [f'execution_error: {outcome}'],
                 'completed_actions': []
-            })
-    
-    end_time = time.time()
-    total_time = end_time - start_time
+            }))
+        else:
+            log(f"✓ {config['drone_id']} test completed")
+            results.append(outcome)
     
-    # Print summary
-    print(f"\n{'='*80}")
-    print(f"MULTI-DRONE TEST SUMMARY")
-    print(f"{'='*80}")
-    print(f"Total test time: {total_time:.2f} seconds")
-    print(f"Drones tested: {len(results)}")
+    total_time = (time.monotonic_ns() - start_ns) / 1e9
     
     successful_drones = [r for r in results if r['success']]
     failed_drones = [r for r in results if not r['success']]
     
-    print(f"Successful: {len(successful_drones)}")
-    print(f"Failed: {len(failed_drones)}")
+    # Build the whole summary, then emit it with a single write
+    lines = [
+        f"\n{'='*80}",
+        "MULTI-DRONE TEST SUMMARY",
+        f"{'='*80}",
+        f"Total test time: {total_time:.2f} seconds",
+        f"Drones tested: {len(results)}",
+        f"Successful: {len(successful_drones)}",
+        f"Failed: {len(failed_drones)}",
+    ]
     
     if successful_drones:
-        print(f"\n✅ Successful drones:")
+        lines.append("\n✅ Successful drones:")
         for result in successful_drones:
-            actions = ', '.join(result['completed_actions'])
-            print(f"  - {result['drone_id']}: {actions}")
+            lines.append(f"  - {result['drone_id']}: {result['actions_str']}")
     
     if failed_drones:
-        print(f"\n❌ Failed drones:")
+        lines.append("\n❌ Failed drones:")
         for result in failed_drones:
-            actions = ', '.join(result['completed_actions']) if result['completed_actions'] else 'none'
-            errors = '; '.join(result['errors']) if result['errors'] else 'unknown'
-            print(f"  - {result['drone_id']}: completed={actions}, errors={errors}")
+            actions = result['actions_str'] or 'none'
+            errors = result['errors_str'] or 'unknown'
+            lines.append(f"  - {result['drone_id']}: completed={actions}, errors={errors}")
+    
+    flush_log()  # Everything logged so far goes out first
+    sys.stdout.buffer.writelines(f"{line}\n".encode() for line in lines)
+    sys.stdout.buffer.flush()
     
     return results
 
 
-def test_swarm_coordination(base_ip='127.0.0.1', start_port=8889, drone_count=3):
+async def test_swarm_coordination(base_ip='127.0.0.1', start_port=8889, drone_count=3):
     """Test coordinated swarm movements"""
-    print(f"\n{'='*80}")
-    print(f"SWARM COORDINATION TEST - {drone_count} drones in formation")
-    print(f"{'='*80}")
+    log(f"\n{'='*80}")
+    log(f"SWARM COORDINATION TEST - {drone_count} drones in formation")
+    log(f"{'='*80}")
     
-    # Create drone instances
-    drones = []
+    # Create drone instances (no I/O), then connect them through the per-host workers below
+    candidates = []
     for i in range(drone_count):
+        drone_id = f'swarm_{i+1}'
         try:
-            drone_id = f'swarm_{i+1}'
             tello = Tello(host=base_ip, control_udp=start_port + i)
-            tello.connect()
-            drones.append({'id': drone_id, 'tello': tello, 'index': i})
-            print(f"✓ {drone_id} connected on port {start_port + i}")
+            candidates.append({'id': drone_id, 'tello': tello, 'index': i})
         except Exception as e:
-            print(f"✗ Failed to connect {drone_id}: {e}")
+            log(f"✗ Failed to connect {drone_id}: {e}")
+    
+    # Send each step to all drones at once so command round-trips overlap.
+    # djitellopy keeps a single response queue per host, so drones on the same
+    # host must take turns: every host gets one worker thread that runs its
+    # drones' commands in order, while drones on different hosts overlap.
+    host_executors = {host: ThreadPoolExecutor(max_workers=1)
+                      for host in {drone['tello'].address[0] for drone in candidates}}
+    loop = asyncio.get_running_loop()
+    
+    async def fan_out(calls, return_exceptions=False):
+        """Run (drone, method name, *args) calls, parallel across hosts, and wait for all of them"""
+        return await asyncio.gather(*[
+            loop.run_in_executor(host_executors[drone['tello'].address[0]],
+                                 getattr(drone['tello'], method_name), *args)
+            for drone, method_name, *args in calls
+        ], return_exceptions=return_exceptions)
+    
+    outcomes = await fan_out([(drone, 'connect') for drone in candidates], return_exceptions=True)
+    drones = []
+    for drone, outcome in zip(candidates, outcomes):
+        if isinstance(outcome, Exception):
+            log(f"✗ Failed to connect {drone['id']}: {outcome}")
+        else:
+            drones.append(drone)
+            log(f"✓ {drone['id']} connected on port {start_port + drone['index']}")
     
     if not drones:
-        print("❌ No drones connected for swarm test")
+        log("❌ No drones connected for swarm test")
+        for executor in host_executors.values():
+            executor.shutdown(wait=True)
         return
     
-    print(f"\n🎯 Starting coordinated swarm maneuvers with {len(drones)} drones...")
+    log(f"\n🎯 Starting coordinated swarm maneuvers with {len(drones)} drones...")
+    
+    async def wait_all_idle():
+        """Advance as soon as the slowest drone has settled"""
+        await asyncio.gather(*[_wait_idle(drone['tello']) for drone in drones])
+    
+    async def check_states(step):
+        """Poll all drones after a step; missing state packets are reported, not fatal"""
+        states = await poll_all(drones)
+        missing = [drone['id'] for drone, state in zip(drones, states) if not state]
+        if missing:
+            log(f"⚠ No state data after {step} from: {', '.join(missing)}")
+        else:
+            heights = ', '.join(f"{drone['id']}={state.get('h', 'N/A')}cm" for drone, state in zip(drones, states))
+            log(f"✓ {step} complete - heights: {heights}")
     
     try:
         # Synchronized takeoff
-        print("🚁 Synchronized takeoff...")
-        for drone in drones:
-            drone['tello'].takeoff()
-        time.sleep(4)  # Wait for all to complete takeoff
+        log("🚁 Synchronized takeoff...")
+        await fan_out([(drone, 'takeoff') for drone in drones])
+        await wait_all_idle()
+        await check_states('takeoff')
         
-        # Formation flying - spread out
-        print("📐 Formation spread...")
-        for i, drone in enumerate(drones):
-            if i == 0:
-                drone['tello'].move_left(100)
-            elif i == 1:
-                pass  # Center drone stays
-            else:
-                drone['tello'].move_right(100)
-        time.sleep(3)
+        # Formation flying - spread out (center drone stays)
+        log("📐 Formation spread...")
+        await fan_out([
+            (drone, 'move_left' if i == 0 else 'move_right', 100)
+            for i, drone in enumerate(drones) if i != 1
+        ])
+        await wait_all_idle()
         
         # Synchronized forward movement
-        print("➡️ Synchronized forward movement...")
-        for drone in drones:
-            drone['tello'].move_forward(150)
-        time.sleep(4)
+        log("➡️ Synchronized forward movement...")
+        await fan_out([(drone, 'move_forward', 150) for drone in drones])
+        await wait_all_idle()
+        await check_states('forward movement')
         
         # Coordinated rotation
-        print("🔄 Coordinated rotation...")
-        for drone in drones:
-            drone['tello'].rotate_clockwise(180)
-        time.sleep(3)
+        log("🔄 Coordinated rotation...")
+        await fan_out([(drone, 'rotate_clockwise', 180) for drone in drones])
+        await wait_all_idle()
+        await check_states('rotation')
         
         # Return to formation
-        print("🔙 Return movement...")
-        for drone in drones:
-            drone['tello'].move_forward(150)
-        time.sleep(4)
+        log("🔙 Return movement...")
+        await fan_out([(drone, 'move_forward', 150) for drone in drones])
+        await wait_all_idle()
         
         # Synchronized landing
-        print("🛬 Synchronized landing...")
-        for drone in drones:
-            drone['tello'].land()
-        time.sleep(4)
+        log("🛬 Synchronized landing...")
+        await fan_out([(drone, 'land') for drone in drones])
+        await wait_all_idle()
+        await check_states('landing')
         
-        print("✅ Swarm coordination test completed successfully!")
+        log("✅ Swarm coordination test completed successfully!")
         
     except Exception as e:
-        print(f"❌ Swarm test failed: {e}")
+        log(f"❌ Swarm test failed: {e}")
         # Emergency landing for all drones
-        print("🚨 Emergency landing all drones...")
-        for drone in drones:
-            try:
-                drone['tello'].emergency()
-            except:
-                pass
+        log("🚨 Emergency landing all drones...")
+        await fan_out([(drone, 'emergency') for drone in drones], return_exceptions=True)
+    finally:
+        for executor in host_executors.values():
+            executor.shutdown(wait=True)
 
 def main():
     """Main test function with multi-drone support"""
+    global SHARED_EXEC
     import argparse
     
     parser = argparse.ArgumentParser(description='RoboMaster TT Multi-Drone Test Suite')
@@ -342,65 +497,75 @@ def main():
                        help='Number of drones to test (default: 3)')
     parser.add_argument('--single-port', type=int,
                        help='Port for single drone test (overrides --port)')
+    parser.add_argument('--rcvbuf', type=int, default=4 * 1024 * 1024,
+                       help='UDP socket buffer size in bytes, avoids dropped state packets with many drones (default: 4 MiB)')
     
     args = parser.parse_args()
     
-    print("RoboMaster TT Multi-Drone Test Suite")
-    print("====================================")
-    print(f"Mode: {args.mode}")
-    print(f"Base IP: {args.ip}")
-    print(f"Starting Port: {args.port}")
+    # Must be set before the first Tello instance opens its sockets
+    Tello.SOCKET_BUFFER_SIZE = args.rcvbuf
+    
+    # Room for a command and a state poll per drone at the same time
+    SHARED_EXEC = ThreadPoolExecutor(max_workers=max(8, 2 * args.count))
+    
+    _install_uvloop()
+    
+    log("RoboMaster TT Multi-Drone Test Suite")
+    log("====================================")
+    log(f"Mode: {args.mode}")
+    log(f"Base IP: {args.ip}")
+    log(f"Starting Port: {args.port}")
     if args.mode != 'single':
-        print(f"Drone Count: {args.count}")
+        log(f"Drone Count: {args.count}")
     
     if args.mode == 'single':
         # Single drone test (legacy mode)
         port = args.single_port if args.single_port else args.port
-        print(f"\n🎯 Testing single drone at {args.ip}:{port}")
-        result = test_single_drone('single_drone', args.ip, port)
+        log(f"\n🎯 Testing single drone at {args.ip}:{port}")
+        result = asyncio.run(test_single_drone('single_drone', args.ip, port))
         
         if result['success']:
-            print(f"\n✅ Single drone test completed successfully!")
-            print(f"Completed actions: {', '.join(result['completed_actions'])}")
+            log(f"\n✅ Single drone test completed successfully!")
+            log(f"Completed actions: {result['actions_str']}")
         else:
-            print(f"\n❌ Single drone test failed!")
+            log(f"\n❌ Single drone test failed!")
             if result['errors']:
-                print(f"Errors: {'; '.join(result['errors'])}")
+                log(f"Errors: {result['errors_str']}")
     
     elif args.mode == 'multi':
         # Multiple independent drones test
-        print(f"\n🎯 Testing {args.count} independent drones")
-        results = test_multiple_drones(args.ip, args.port, args.count)
+        log(f"\n🎯 Testing {args.count} independent drones")
+        results = asyncio.run(test_multiple_drones(args.ip, args.port, args.count))
         
         success_rate = len([r for r in results if r['success']]) / len(results) * 100
-        print(f"\n📊 Overall success rate: {success_rate:.1f}%")
+        log(f"\n📊 Overall success rate: {success_rate:.1f}%")
     
     elif args.mode == 'swarm':
         # Coordinated swarm test
-        print(f"\n🎯 Testing {args.count} drones in coordinated swarm")
-        test_swarm_coordination(args.ip, args.port, args.count)
+        log(f"\n🎯 Testing {args.count} drones in coordinated swarm")
+        asyncio.run(test_swarm_coordination(args.ip, args.port, args.count))
     
-    print(f"\n{'='*80}")
-    print("SETUP INSTRUCTIONS FOR MOCK DRONES:")
-    print("="*80)
+    log(f"\n{'='*80}")
+    log("SETUP INSTRUCTIONS FOR MOCK DRONES:")
+    log("="*80)
     
     if args.mode == 'single':
         port = args.single_port if args.single_port else args.port
-        print(f"For single drone test:")
-        print(f"  python -m mock_drone.mock_drone --drone-id test_drone --port {port}")
+        log(f"For single drone test:")
+        log(f"  python -m mock_drone.mock_drone --drone-id test_drone --port {port}")
     else:
-        print(f"For {args.count} mock drones, run these commands in separate terminals:")
+        log(f"For {args.count} mock drones, run these commands in separate terminals:")
         for i in range(args.count):
             drone_port = args.port + i
-            print(f"  python -m mock_drone.mock_drone --drone-id drone_{i+1} --port {drone_port}")
+            log(f"  python -m mock_drone.mock_drone --drone-id drone_{i+1} --port {drone_port}")
         
-        print(f"\nOr use the drone manager to start all at once:")
-        print(f"  python -m mock_drone.drone_manager --count {args.count} --prefix drone")
+        log(f"\nOr use the drone manager to start all at once:")
+        log(f"  python -m mock_drone.drone_manager --count {args.count} --prefix drone")
     
-    print(f"\nFor remote testing (different machines):")
-    print(f"  1. On drone machine: Start mock drones with --host 0.0.0.0")
-    print(f"  2. On test machine: python test_simple_drone.py --ip <DRONE_MACHINE_IP>")
-    print("="*80)
+    log(f"\nFor remote testing (different machines):")
+    log(f"  1. On drone machine: Start mock drones with --host 0.0.0.0")
+    log(f"  2. On test machine: python test_simple_drone.py --ip <DRONE_MACHINE_IP>")
+    log("="*80)
 
 if __name__ == "__main__":
     main()
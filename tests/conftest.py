@@ -0,0 +1,60 @@
+"""
+Shared pytest fixtures
+"""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+import backend.server
+from backend.server import app, DroneStateManager, WebSocketManager, get_drone_state_manager
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Run all asyncio tests and fixtures on one event loop for the session
+    
+    The loop is a uvloop one where uvloop is installed (it doesn't support Windows).
+    """
+    loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+    yield loop
+    # Cancel tasks tests left running before closing the loop
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Create one test client for the FastAPI app, running its lifespan once"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def state_manager():
+    """Give a test its own DroneStateManager behind the app's dependency"""
+    manager = DroneStateManager()
+    app.dependency_overrides[get_drone_state_manager] = lambda: manager
+    yield manager
+    app.dependency_overrides.pop(get_drone_state_manager, None)
+
+
+@pytest.fixture
+def ws_manager(monkeypatch):
+    """Give a test its own WebSocketManager in place of the module global"""
+    manager = WebSocketManager()
+    monkeypatch.setattr(backend.server, "websocket_manager", manager)
+    return manager
+
+
+@pytest.fixture
+def isolated_backend(state_manager, ws_manager):
+    """Run a test against fresh backend managers instead of the shared globals"""
+    return state_manager, ws_manager
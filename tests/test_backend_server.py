@@ -3,20 +3,50 @@ Unit tests for FastAPI backend server functionality
 """
 import pytest
 import asyncio
+import copy
 import json
-from fastapi.testclient import TestClient
-from fastapi.websockets import WebSocket
-from unittest.mock import Mock, patch, AsyncMock
-import sys
-import os
+import pickle
+from dataclasses import replace
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from backend.server import app, drone_state_manager, websocket_manager, config_manager
+from backend.server import (
+    app, websocket_manager, config_manager, DroneStateManager
+)
 from backend.models import DroneState, Vector3
 
 
+# Built once; tests that hand a state to a manager take a copy with replace()
+SAMPLE_DRONE_STATE = DroneState(
+    drone_id="test_drone",
+    udp_port=8889,
+    position=Vector3(100, 200, 150),
+    rotation=Vector3(0, 0, 90),
+    velocity=Vector3(10, 20, 5),
+    is_flying=True,
+    battery=85
+)
+
+
+class StubWS:
+    """Minimal WebSocket stand-in that records sent messages"""
+    
+    def __init__(self):
+        self.sent = []
+        self.accepted = False
+    
+    async def accept(self):
+        self.accepted = True
+    
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
+class FailingStubWS(StubWS):
+    """WebSocket stand-in whose sends always fail"""
+    
+    async def send_text(self, message):
+        raise Exception("Connection error")
+
+
 class TestDroneStateManager:
     """Test cases for DroneStateManager class"""
     
@@ -29,15 +59,9 @@ class TestDroneStateManager:
     @pytest.fixture
     def sample_drone_state(self):
         """Create a sample drone state for testing"""
-        return DroneState(
-            drone_id="test_drone",
-            udp_port=8889,
-            position=Vector3(100, 200, 150),
-            rotation=Vector3(0, 0, 90),
-            velocity=Vector3(10, 20, 5),
-            is_flying=True,
-            battery=85
-        )
+        # add_drone rebinds the state's buffer into the manager, so each test
+        # gets its own copy of the shared sample
+        return replace(SAMPLE_DRONE_STATE)
     
     def test_add_drone(self, drone_state_manager_instance, sample_drone_state):
         """Test adding a drone to the manager"""
@@ -122,13 +146,150 @@ class TestDroneStateManager:
         drone_state_manager_instance.add_drone(drone2)
         
         # Simulate old timestamp for drone1
-        drone_state_manager_instance.last_update_times["drone1"] = time.time() - 60  # 60 seconds ago
+        drone_state_manager_instance._record_update("drone1", time.time() - 60)  # 60 seconds ago
         
         inactive_drones = drone_state_manager_instance.cleanup_inactive_drones(30)  # 30 second timeout
         
         assert "drone1" in inactive_drones
         assert "drone1" not in drone_state_manager_instance.drones
         assert "drone2" in drone_state_manager_instance.drones  # Should still be active
+    
+    def test_get_positions(self, drone_state_manager_instance, sample_drone_state):
+        """Test that positions are gathered from the shared state block"""
+        drone_state_manager_instance.add_drone(sample_drone_state)
+        drone_state_manager_instance.add_drone(DroneState("drone2", 8890, position=Vector3(1, 2, 3)))
+        drone_state_manager_instance.update_drone_state("drone2", {"position": {"x": 4, "y": 5, "z": 6}})
+        
+        drone_ids, positions = drone_state_manager_instance.get_positions()
+        
+        assert drone_ids == ["test_drone", "drone2"]
+        assert positions.tolist() == [[100, 200, 150], [4, 5, 6]]
+    
+    def test_update_drone_state_batch_matches_single_updates(self):
+        """Test that a batched position update equals the same updates made one by one"""
+        from backend.server import DroneStateManager
+        
+        batched = DroneStateManager()
+        single = DroneStateManager()
+        positions = {f"drone{i}": (i, -i, i / 4) for i in range(1000)}
+        for manager in (batched, single):
+            for i, drone_id in enumerate(positions):
+                manager.add_drone(DroneState(drone_id, 8889 + i))
+        
+        assert batched.update_drone_state_batch({**positions, "unknown": (0, 0, 0)}) == 1000
+        for drone_id, (x, y, z) in positions.items():
+            single.update_drone_state(drone_id, {"position": {"x": x, "y": y, "z": z}})
+        
+        assert batched.get_positions()[1].tolist() == single.get_positions()[1].tolist()
+        assert batched.get_drone_state("drone999").position == single.get_drone_state("drone999").position
+    
+    def test_get_drones_out_of_bounds(self, drone_state_manager_instance):
+        """Test the fleet-wide scene bounds check"""
+        drone_state_manager_instance.add_drone(DroneState("inside", 8889, position=Vector3(-500, 500, 500)))
+        drone_state_manager_instance.add_drone(DroneState("past_x", 8890, position=Vector3(-501, 0, 100)))
+        drone_state_manager_instance.add_drone(DroneState("past_y", 8891, position=Vector3(0, 501, 100)))
+        drone_state_manager_instance.add_drone(DroneState("past_ceiling", 8892, position=Vector3(0, 0, 501)))
+        
+        assert drone_state_manager_instance.get_drones_out_of_bounds((1000, 1000, 500)) == [
+            "past_x", "past_y", "past_ceiling"
+        ]
+    
+    def test_state_block_growth_keeps_states(self, drone_state_manager_instance):
+        """Test that growing past the initial capacity keeps drone states and references"""
+        from backend.server import DroneStateManager
+        
+        count = DroneStateManager.INITIAL_CAPACITY * 2 + 1
+        first_drone = DroneState("drone0", 8889, position=Vector3(1, 1, 1))
+        first_position = first_drone.position
+        drone_state_manager_instance.add_drone(first_drone)
+        for i in range(1, count):
+            drone_state_manager_instance.add_drone(DroneState(f"drone{i}", 8889 + i, position=Vector3(i, i, i)))
+        
+        first_position.x = 42
+        
+        drone_ids, positions = drone_state_manager_instance.get_positions()
+        assert len(drone_ids) == count
+        assert positions[0].tolist() == [42, 1, 1]
+        assert positions[-1].tolist() == [count - 1] * 3
+        assert drone_state_manager_instance.get_drone_state("drone0").position.x == 42
+    
+    def test_removed_drone_keeps_its_values(self, drone_state_manager_instance, sample_drone_state):
+        """Test that a removed drone is detached before its row is reused"""
+        drone_state_manager_instance.add_drone(sample_drone_state)
+        drone_state_manager_instance.remove_drone("test_drone")
+        drone_state_manager_instance.add_drone(DroneState("drone2", 8890, position=Vector3(1, 2, 3)))
+        
+        assert sample_drone_state.position == Vector3(100, 200, 150)
+        assert drone_state_manager_instance.get_drone_state("drone2").position == Vector3(1, 2, 3)
+    
+    @pytest.mark.parametrize("clone", [
+        copy.deepcopy,
+        lambda state: pickle.loads(pickle.dumps(state)),
+    ], ids=["deepcopy", "pickle"])
+    def test_copied_state_views_its_own_buffer(self, drone_state_manager_instance, sample_drone_state, clone):
+        """Test that a deep-copied or unpickled state's vectors are views of its own buffer"""
+        drone_state_manager_instance.add_drone(sample_drone_state)
+        copied = clone(sample_drone_state)
+        
+        copied.position.x = 50
+        copied.velocity.z = -5
+        
+        assert copied._buf[:3].tolist() == [50, 200, 150]
+        assert copied._buf[3:6].tolist() == [10, 20, -5]
+        assert sample_drone_state.position == Vector3(100, 200, 150)
+        
+        # bind_buffer carries the copy's current values across
+        manager = DroneStateManager()
+        manager.add_drone(copied)
+        assert manager.get_positions()[1].tolist() == [[50, 200, 150]]
+    
+    def test_replaced_drone_keeps_its_values(self, drone_state_manager_instance, sample_drone_state):
+        """Test that re-adding a drone ID detaches the state it replaces"""
+        drone_state_manager_instance.add_drone(sample_drone_state)
+        drone_state_manager_instance.add_drone(DroneState("test_drone", 8889, position=Vector3(1, 2, 3)))
+        
+        assert sample_drone_state.position == Vector3(100, 200, 150)
+        assert drone_state_manager_instance.get_drone_state("test_drone").position == Vector3(1, 2, 3)
+    
+    def test_cleanup_skips_drones_updated_since(self, drone_state_manager_instance):
+        """Test that a later update supersedes an old entry in the cleanup sweep"""
+        import time
+        
+        drone_state_manager_instance.add_drone(DroneState("drone1", 8889))
+        drone_state_manager_instance._record_update("drone1", time.time() - 60)
+        drone_state_manager_instance.update_drone_state("drone1", {"battery": 90})
+        
+        assert drone_state_manager_instance.cleanup_inactive_drones(30) == []
+        assert "drone1" in drone_state_manager_instance.drones
+    
+    @pytest.mark.parametrize("fleet_size", [10, 10000])
+    def test_cleanup_inactive_drones_fleet(self, drone_state_manager_instance, fleet_size):
+        """Test cleanup removes exactly the stale half of a fleet"""
+        import time
+        
+        now = time.time()
+        for i in range(fleet_size):
+            drone_id = f"drone{i}"
+            drone_state_manager_instance.add_drone(DroneState(drone_id, 8889 + i))
+            if i % 2:
+                drone_state_manager_instance._record_update(drone_id, now - 60)
+        
+        inactive_drones = drone_state_manager_instance.cleanup_inactive_drones(30)
+        
+        assert sorted(inactive_drones) == sorted(f"drone{i}" for i in range(1, fleet_size, 2))
+        assert len(drone_state_manager_instance.drones) == fleet_size // 2
+        assert drone_state_manager_instance.cleanup_inactive_drones(30) == []
+    
+    def test_state_version_bumped_on_change(self, drone_state_manager_instance, sample_drone_state):
+        """Test that adding and updating a drone bump its state version"""
+        drone_state_manager_instance.add_drone(sample_drone_state)
+        added_version = drone_state_manager_instance.state_versions["test_drone"]
+        
+        drone_state_manager_instance.update_drone_state("test_drone", {"battery": 70})
+        assert drone_state_manager_instance.state_versions["test_drone"] > added_version
+        
+        drone_state_manager_instance.remove_drone("test_drone")
+        assert "test_drone" not in drone_state_manager_instance.state_versions
 
 
 class TestWebSocketManager:
@@ -142,79 +303,176 @@ class TestWebSocketManager:
     
     @pytest.fixture
     def mock_websocket(self):
-        """Create a mock WebSocket for testing"""
-        websocket = Mock(spec=WebSocket)
-        websocket.accept = AsyncMock()
-        websocket.send_text = AsyncMock()
-        return websocket
+        """Create a stub WebSocket for testing"""
+        return StubWS()
     
-    @pytest.mark.asyncio
     async def test_connect_websocket(self, websocket_manager_instance, mock_websocket):
         """Test WebSocket connection"""
         await websocket_manager_instance.connect(mock_websocket)
         
         assert mock_websocket in websocket_manager_instance.active_connections
-        mock_websocket.accept.assert_called_once()
+        assert mock_websocket.accepted
     
-    def test_disconnect_websocket(self, websocket_manager_instance, mock_websocket):
+    async def test_connect_sends_initial_message_first(self, websocket_manager_instance, mock_websocket):
+        """Test that the connect-time message is delivered before any broadcast"""
+        await websocket_manager_instance.connect(mock_websocket, lambda: "snapshot")
+        await websocket_manager_instance.broadcast("update")
+        await asyncio.wait_for(websocket_manager_instance.flush(), timeout=1.0)
+        
+        assert mock_websocket.sent == ["snapshot", "update"]
+    
+    async def test_disconnect_websocket(self, websocket_manager_instance, mock_websocket):
         """Test WebSocket disconnection"""
         # Add connection first
-        websocket_manager_instance.active_connections.append(mock_websocket)
+        await websocket_manager_instance.connect(mock_websocket)
+        sender = websocket_manager_instance._senders[mock_websocket]
         
         websocket_manager_instance.disconnect(mock_websocket)
+        await asyncio.sleep(0)
         
         assert mock_websocket not in websocket_manager_instance.active_connections
+        assert sender.cancelled()
     
-    @pytest.mark.asyncio
     async def test_send_personal_message(self, websocket_manager_instance, mock_websocket):
         """Test sending personal message"""
         await websocket_manager_instance.send_personal_message("test message", mock_websocket)
         
-        mock_websocket.send_text.assert_called_once_with("test message")
+        assert mock_websocket.sent == ["test message"]
     
-    @pytest.mark.asyncio
-    async def test_send_personal_message_error(self, websocket_manager_instance, mock_websocket):
+    async def test_send_personal_message_error(self, websocket_manager_instance):
         """Test handling error in personal message"""
-        mock_websocket.send_text.side_effect = Exception("Connection error")
-        websocket_manager_instance.active_connections.append(mock_websocket)
+        failing_websocket = FailingStubWS()
+        await websocket_manager_instance.connect(failing_websocket)
         
-        await websocket_manager_instance.send_personal_message("test message", mock_websocket)
+        await websocket_manager_instance.send_personal_message("test message", failing_websocket)
         
         # Should be disconnected after error
-        assert mock_websocket not in websocket_manager_instance.active_connections
+        assert failing_websocket not in websocket_manager_instance.active_connections
     
-    @pytest.mark.asyncio
     async def test_broadcast(self, websocket_manager_instance):
         """Test broadcasting to all connections"""
-        mock_ws1 = Mock(spec=WebSocket)
-        mock_ws1.send_text = AsyncMock()
-        mock_ws2 = Mock(spec=WebSocket)
-        mock_ws2.send_text = AsyncMock()
-        
-        websocket_manager_instance.active_connections = [mock_ws1, mock_ws2]
+        ws1 = StubWS()
+        ws2 = StubWS()
+        await websocket_manager_instance.connect(ws1)
+        await websocket_manager_instance.connect(ws2)
         
         await websocket_manager_instance.broadcast("test broadcast")
+        await asyncio.wait_for(websocket_manager_instance.flush(), timeout=1.0)
         
-        mock_ws1.send_text.assert_called_once_with("test broadcast")
-        mock_ws2.send_text.assert_called_once_with("test broadcast")
+        assert ws1.sent == ["test broadcast"]
+        assert ws2.sent == ["test broadcast"]
     
-    @pytest.mark.asyncio
     async def test_broadcast_with_error(self, websocket_manager_instance):
         """Test broadcasting with connection error"""
-        mock_ws1 = Mock(spec=WebSocket)
-        mock_ws1.send_text = AsyncMock()
-        mock_ws2 = Mock(spec=WebSocket)
-        mock_ws2.send_text = AsyncMock(side_effect=Exception("Connection error"))
-        
-        websocket_manager_instance.active_connections = [mock_ws1, mock_ws2]
+        ws1 = StubWS()
+        ws2 = FailingStubWS()
+        await websocket_manager_instance.connect(ws1)
+        await websocket_manager_instance.connect(ws2)
         
         await websocket_manager_instance.broadcast("test broadcast")
+        await asyncio.wait_for(websocket_manager_instance.flush(), timeout=1.0)
         
         # First connection should receive message
-        mock_ws1.send_text.assert_called_once_with("test broadcast")
+        assert ws1.sent == ["test broadcast"]
         # Second connection should be removed due to error
-        assert mock_ws2 not in websocket_manager_instance.active_connections
-        assert mock_ws1 in websocket_manager_instance.active_connections
+        assert set(websocket_manager_instance.active_connections) == {ws1}
+    
+    async def test_broadcast_failure_storm(self, websocket_manager_instance):
+        """Test that many failing clients are each removed once and the rest are served"""
+        websockets = [FailingStubWS() if i % 10 == 0 else StubWS() for i in range(10000)]
+        for websocket in websockets:
+            await websocket_manager_instance.connect(websocket)
+        
+        await websocket_manager_instance.broadcast("test broadcast")
+        await asyncio.wait_for(websocket_manager_instance.flush(), timeout=5.0)
+        
+        healthy = {websocket for websocket in websockets if not isinstance(websocket, FailingStubWS)}
+        assert set(websocket_manager_instance.active_connections) == healthy
+        assert all(websocket.sent == ["test broadcast"] for websocket in healthy)
+    
+    async def test_disconnect_cancels_in_flight_send(self, websocket_manager_instance):
+        """Test that disconnecting mid-send cancels the sender without counting as a failure"""
+        send_started = asyncio.Event()
+        
+        class HangingStubWS(StubWS):
+            async def send_text(self, message):
+                send_started.set()
+                await asyncio.sleep(10)
+        
+        websocket = HangingStubWS()
+        await websocket_manager_instance.connect(websocket)
+        sender = websocket_manager_instance._senders[websocket]
+        await websocket_manager_instance.broadcast("first")
+        await websocket_manager_instance.broadcast("second")
+        await asyncio.wait_for(send_started.wait(), timeout=1.0)
+        flush = asyncio.create_task(websocket_manager_instance.flush())
+        await asyncio.sleep(0)
+        
+        websocket_manager_instance.disconnect(websocket)
+        
+        with pytest.raises(asyncio.CancelledError):
+            await sender
+        assert websocket not in websocket_manager_instance.active_connections
+        # Both the in-flight and the queued message are settled, so flush returns
+        await asyncio.wait_for(flush, timeout=1.0)
+    
+    async def test_broadcast_is_concurrent(self, websocket_manager_instance):
+        """Test that a slow connection doesn't hold up sends to the others"""
+        second_sent = asyncio.Event()
+        
+        class WaitingStubWS(StubWS):
+            async def send_text(self, message):
+                # Only completes if the second send starts while this one is pending
+                await second_sent.wait()
+                await super().send_text(message)
+        
+        class SignallingStubWS(StubWS):
+            async def send_text(self, message):
+                second_sent.set()
+                await super().send_text(message)
+        
+        ws1 = WaitingStubWS()
+        ws2 = SignallingStubWS()
+        await websocket_manager_instance.connect(ws1)
+        await websocket_manager_instance.connect(ws2)
+        
+        await websocket_manager_instance.broadcast("test broadcast")
+        await asyncio.wait_for(websocket_manager_instance.flush(), timeout=1.0)
+        
+        assert ws1.sent == ["test broadcast"]
+        assert ws2.sent == ["test broadcast"]
+    
+    async def test_slow_client_is_isolated(self, websocket_manager_instance):
+        """Test that a stalled client loses old messages while others receive everything"""
+        websocket_manager_instance.SEND_QUEUE_SIZE = 2
+        websocket_manager_instance.MAX_DROPPED_MESSAGES = 5
+        
+        class StalledStubWS(StubWS):
+            async def send_text(self, message):
+                await asyncio.sleep(1)
+        
+        fast = StubWS()
+        stalled = StalledStubWS()
+        await websocket_manager_instance.connect(fast)
+        await websocket_manager_instance.connect(stalled)
+        
+        for i in range(4):
+            await websocket_manager_instance.broadcast(f"message {i}")
+            await asyncio.sleep(0)
+        await asyncio.wait_for(websocket_manager_instance.active_connections[fast].join(), timeout=0.5)
+        
+        # The stalled client is still connected but has dropped its oldest messages
+        assert fast.sent == [f"message {i}" for i in range(4)]
+        assert websocket_manager_instance.dropped_messages[stalled] > 0
+        assert stalled in websocket_manager_instance.active_connections
+        
+        for i in range(4, 12):
+            await websocket_manager_instance.broadcast(f"message {i}")
+            await asyncio.sleep(0)
+        
+        # Too many drops: the stalled client is disconnected, the fast one is not
+        assert stalled not in websocket_manager_instance.active_connections
+        assert fast in websocket_manager_instance.active_connections
     
     def test_serialize_drone_state(self, websocket_manager_instance):
         """Test drone state serialization"""
@@ -245,26 +503,80 @@ class TestWebSocketManager:
         assert serialized["battery"] == 85
         assert serialized["temperature"] == 35
         assert serialized["flight_time"] == 120
+    
+    @pytest.mark.benchmark
+    def test_serialize_drone_state_benchmark(self, request, websocket_manager_instance):
+        """Benchmark building a drone state message, dict and JSON text"""
+        pytest.importorskip("pytest_benchmark")
+        benchmark = request.getfixturevalue("benchmark")
+        drone_state = replace(SAMPLE_DRONE_STATE)
+        
+        def serialize():
+            return websocket_manager_instance.drone_state_message(
+                "drone_state_update", "state", "test_drone", drone_state)
+        
+        assert json.loads(benchmark(serialize))["state"]["drone_id"] == "test_drone"
+    
+    def test_serialize_rounds_stored_vectors(self, websocket_manager_instance):
+        """Test that vectors in the state block keep full precision and are rounded only on the wire"""
+        from backend.server import DroneStateManager
+        
+        manager = DroneStateManager()
+        manager.add_drone(DroneState("test_drone", 8889, position=Vector3(100.1, -0.3, 12.345678)))
+        drone_state = manager.get_drone_state("test_drone")
+        
+        serialized = websocket_manager_instance._serialize_drone_state(drone_state)
+        
+        assert drone_state.position.as_tuple() == (100.1, -0.3, 12.345678)
+        assert serialized["position"] == {"x": 100.1, "y": -0.3, "z": 12.35}
+    
+    def test_serialize_drone_state_json_cached(self, websocket_manager_instance):
+        """Test that serialized state JSON is reused until the version changes"""
+        drone_state = DroneState("test_drone", 8889, battery=85)
+        
+        first = websocket_manager_instance._serialize_drone_state_json("test_drone", drone_state, 1)
+        drone_state.battery = 70
+        assert websocket_manager_instance._serialize_drone_state_json("test_drone", drone_state, 1) is first
+        
+        updated = websocket_manager_instance._serialize_drone_state_json("test_drone", drone_state, 2)
+        assert json.loads(first)["battery"] == 85
+        assert json.loads(updated)["battery"] == 70
+    
+    def test_snapshot_message(self, websocket_manager_instance):
+        """Test that a snapshot carries every drone state in order"""
+        drones = {
+            "drone1": DroneState("drone1", 8889, battery=80),
+            "drone2": DroneState("drone2", 8890, battery=90)
+        }
+        
+        message = json.loads(websocket_manager_instance.snapshot_message(drones, {"drone1": 1}))
+        
+        assert message["type"] == "snapshot"
+        assert [state["drone_id"] for state in message["drones"]] == ["drone1", "drone2"]
+        assert [state["battery"] for state in message["drones"]] == [80, 90]
+    
+    def test_drone_state_message(self, websocket_manager_instance):
+        """Test drone state messages decode to the documented shape"""
+        drone_state = DroneState("test_drone", 8889, battery=85)
+        
+        message = json.loads(websocket_manager_instance.drone_state_message(
+            "drone_state_update", "state", "test_drone", drone_state, 1))
+        
+        assert message["type"] == "drone_state_update"
+        assert message["drone_id"] == "test_drone"
+        assert message["state"] == json.loads(json.dumps(
+            websocket_manager_instance._serialize_drone_state(drone_state)))
 
 
 class TestBackendAPI:
     """Test cases for FastAPI backend endpoints"""
     
-    @pytest.fixture
-    def client(self):
-        """Create a test client for the FastAPI app"""
-        return TestClient(app)
-    
     @pytest.fixture(autouse=True)
-    def setup_and_teardown(self):
-        """Setup and teardown for each test"""
-        # Clear drone state manager before each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
+    def setup_and_teardown(self, state_manager):
+        """Teardown for each test"""
+        # Drone state is per test via state_manager; only connections are global
         yield
-        # Clear after each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
+        websocket_manager.active_connections.clear()
     
     def test_health_check(self, client):
         """Test health check endpoint"""
@@ -277,6 +589,17 @@ class TestBackendAPI:
         assert "active_drones" in data
         assert "websocket_connections" in data
     
+    async def test_cleanup_sweep_uses_overridden_manager(self, state_manager, ws_manager):
+        """Test the background cleanup sweep resolves the manager like the routes do"""
+        import time
+        from backend.server import cleanup_inactive_drones_once
+        
+        state_manager.add_drone(DroneState("stale", 8889))
+        state_manager._record_update("stale", time.time() - 60)
+        
+        assert await cleanup_inactive_drones_once(30) == ["stale"]
+        assert "stale" not in state_manager.drones
+    
     def test_get_config(self, client):
         """Test get configuration endpoint"""
         response = client.get("/api/config")
@@ -310,7 +633,7 @@ class TestBackendAPI:
         assert data["count"] == 0
         assert data["drones"] == {}
     
-    def test_update_drone_state_new_drone(self, client):
+    def test_update_drone_state_new_drone(self, client, state_manager):
         """Test updating state for a new drone"""
         state_update = {
             "udp_port": 8889,
@@ -326,17 +649,17 @@ class TestBackendAPI:
         assert data["status"] == "success"
         
         # Verify drone was added
-        assert "test_drone" in drone_state_manager.drones
-        drone_state = drone_state_manager.get_drone_state("test_drone")
+        assert "test_drone" in state_manager.drones
+        drone_state = state_manager.get_drone_state("test_drone")
         assert drone_state.position.x == 100
         assert drone_state.is_flying is True
         assert drone_state.battery == 85
     
-    def test_update_drone_state_existing_drone(self, client):
+    def test_update_drone_state_existing_drone(self, client, state_manager):
         """Test updating state for an existing drone"""
         # Add drone first
         drone_state = DroneState("test_drone", 8889)
-        drone_state_manager.add_drone(drone_state)
+        state_manager.add_drone(drone_state)
         
         state_update = {
             "position": {"x": 300, "y": 400, "z": 200},
@@ -347,11 +670,11 @@ class TestBackendAPI:
         assert response.status_code == 200
         
         # Verify update
-        updated_drone = drone_state_manager.get_drone_state("test_drone")
+        updated_drone = state_manager.get_drone_state("test_drone")
         assert updated_drone.position.x == 300
         assert updated_drone.battery == 75
     
-    def test_get_specific_drone_state(self, client):
+    def test_get_specific_drone_state(self, client, state_manager):
         """Test getting specific drone state"""
         # Add drone first
         drone_state = DroneState(
@@ -359,7 +682,7 @@ class TestBackendAPI:
             position=Vector3(100, 200, 150),
             battery=85
         )
-        drone_state_manager.add_drone(drone_state)
+        state_manager.add_drone(drone_state)
         
         response = client.get("/api/drones/test_drone")
         assert response.status_code == 200
@@ -374,11 +697,11 @@ class TestBackendAPI:
         response = client.get("/api/drones/nonexistent")
         assert response.status_code == 404
     
-    def test_remove_drone(self, client):
+    def test_remove_drone(self, client, state_manager):
         """Test removing a drone"""
         # Add drone first
         drone_state = DroneState("test_drone", 8889)
-        drone_state_manager.add_drone(drone_state)
+        state_manager.add_drone(drone_state)
         
         response = client.delete("/api/drones/test_drone")
         assert response.status_code == 200
@@ -387,21 +710,21 @@ class TestBackendAPI:
         assert data["status"] == "success"
         
         # Verify drone was removed
-        assert "test_drone" not in drone_state_manager.drones
+        assert "test_drone" not in state_manager.drones
     
     def test_remove_nonexistent_drone(self, client):
         """Test removing a nonexistent drone"""
         response = client.delete("/api/drones/nonexistent")
         assert response.status_code == 404
     
-    def test_get_all_drones_with_data(self, client):
+    def test_get_all_drones_with_data(self, client, state_manager):
         """Test getting all drones when some exist"""
         # Add test drones
         drone1 = DroneState("drone1", 8889, battery=80)
         drone2 = DroneState("drone2", 8890, battery=90)
         
-        drone_state_manager.add_drone(drone1)
-        drone_state_manager.add_drone(drone2)
+        state_manager.add_drone(drone1)
+        state_manager.add_drone(drone2)
         
         response = client.get("/api/drones")
         assert response.status_code == 200
@@ -412,49 +735,80 @@ class TestBackendAPI:
         assert "drone2" in data["drones"]
         assert data["drones"]["drone1"]["battery"] == 80
         assert data["drones"]["drone2"]["battery"] == 90
+    
+    def test_get_all_drones_reflects_updates(self, client, state_manager):
+        """Test that cached drone JSON is refreshed after a state update"""
+        state_manager.add_drone(DroneState("drone1", 8889, battery=80))
+        assert client.get("/api/drones").json()["drones"]["drone1"]["battery"] == 80
+        
+        client.post("/api/drones/drone1/state", json={"battery": 60, "position": {"x": 5, "y": 0, "z": 0}})
+        
+        drone = client.get("/api/drones").json()["drones"]["drone1"]
+        assert drone["battery"] == 60
+        assert drone["position"]["x"] == 5
+    
+    def test_get_all_drones_reuses_unchanged_state(self, client, state_manager):
+        """Test that an unchanged drone is not serialized again"""
+        state_manager.add_drone(DroneState("drone1", 8889, battery=80))
+        client.get("/api/drones")
+        cached = websocket_manager._state_json_cache["drone1"]
+        
+        client.get("/api/drones")
+        
+        assert websocket_manager._state_json_cache["drone1"] is cached
 
 
 class TestWebSocketEndpoint:
     """Test cases for WebSocket endpoint"""
     
-    @pytest.fixture(autouse=True)
-    def setup_and_teardown(self):
-        """Setup and teardown for each test"""
-        # Clear drone state manager before each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
-        websocket_manager.active_connections.clear()
-        yield
-        # Clear after each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
+    @pytest.fixture(scope="class")
+    def persistent_ws(self, client):
+        """Open one WebSocket connection shared by the tests in this class"""
         websocket_manager.active_connections.clear()
+        with client.websocket_connect("/ws") as websocket:
+            yield websocket
     
-    def test_websocket_connection(self):
-        """Test WebSocket connection"""
-        client = TestClient(app)
-        
+    @pytest.fixture
+    def fresh_ws(self, client):
+        """Open a new WebSocket connection for tests that need the connect-time replay"""
         with client.websocket_connect("/ws") as websocket:
-            # Connection should be established
-            assert len(websocket_manager.active_connections) == 1
+            yield websocket
     
-    def test_websocket_receives_existing_drones(self):
-        """Test that new WebSocket connections receive existing drone states"""
-        # Add a drone before connecting
+    @pytest.fixture
+    def existing_drone(self, state_manager):
+        """Register a drone before any fresh connection is opened"""
         drone_state = DroneState("test_drone", 8889, battery=85)
-        drone_state_manager.add_drone(drone_state)
+        state_manager.add_drone(drone_state)
+        return drone_state
+    
+    def test_websocket_connection(self, persistent_ws):
+        """Test WebSocket connection"""
+        # Connection should be established
+        assert len(websocket_manager.active_connections) == 1
+    
+    def test_websocket_receives_drone_updates(self, client, state_manager, persistent_ws):
+        """Test that a connected client receives drone added and state update broadcasts"""
+        response = client.post("/api/drones/test_drone/state", json={"battery": 70})
+        assert response.status_code == 200
         
-        client = TestClient(app)
+        added = json.loads(persistent_ws.receive_text())
+        assert added["type"] == "drone_added"
+        assert added["drone_id"] == "test_drone"
         
-        with client.websocket_connect("/ws") as websocket:
-            # Should receive drone_added message for existing drone
-            data = websocket.receive_text()
-            message = json.loads(data)
-            
-            assert message["type"] == "drone_added"
-            assert message["drone_id"] == "test_drone"
-            assert message["initial_state"]["battery"] == 85
-
+        update = json.loads(persistent_ws.receive_text())
+        assert update["type"] == "drone_state_update"
+        assert update["state"]["battery"] == 70
+    
+    def test_websocket_receives_existing_drones(self, existing_drone, fresh_ws):
+        """Test that new WebSocket connections receive existing drone states"""
+        # Should receive one snapshot message holding the existing drone
+        data = fresh_ws.receive_text()
+        message = json.loads(data)
+        
+        assert message["type"] == "snapshot"
+        assert len(message["drones"]) == 1
+        assert message["drones"][0]["drone_id"] == "test_drone"
+        assert message["drones"][0]["battery"] == 85
 
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
@@ -2,135 +2,142 @@
 Integration tests for mock drone to backend server communication
 """
 import pytest
+import pytest_asyncio
 import asyncio
 import json
-from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, AsyncMock
-import sys
-import os
+import weakref
+from unittest.mock import ANY, Mock, MagicMock, AsyncMock
 import aiohttp
+import httpx
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
 
 from mock_drone.mock_drone import MockDrone
-from backend.server import app, drone_state_manager, websocket_manager
+from backend.server import app
 from backend.models import DroneState, Vector3, SimulationConfig
 
+JSON_HEADERS = {"content-type": "application/json"}
+
+# Request bodies serialized once at import, with the standard library rather than
+# the backend's own encoder; tests only iterate over them
+FLEET_STATE_BODIES = tuple(
+    json.dumps({
+        "udp_port": 8889 + i,
+        "position": {"x": i * 100, "y": i * 100, "z": 100},
+        "is_flying": True,
+        "battery": 90 - i * 5
+    })
+    for i in range(3)
+)
+WS_STATE_BODIES = tuple(
+    json.dumps({
+        "udp_port": 8889 + i,
+        "position": {"x": i * 100, "y": i * 100, "z": 100},
+        "battery": 90 - i * 10
+    })
+    for i in range(2)
+)
+
+pytestmark = pytest.mark.usefixtures("isolated_backend")
+
+
+@pytest_asyncio.fixture(scope="module")
+async def http_session():
+    """One aiohttp session for the module; its requests are patched out in these tests"""
+    # No connection is ever opened, so skip the connector's pool limit and SSL setup
+    connector = aiohttp.TCPConnector(limit=0, ssl=False)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def asgi_client():
+    """Drive the app in-process on the test's event loop, without TestClient's thread"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        yield async_client
+
+
+@pytest.fixture
+def patched_post(monkeypatch):
+    """Stub ClientSession.post for one test with a 200 response"""
+    post = MagicMock()
+    post.return_value.__aenter__.return_value = Mock(status=200)
+    monkeypatch.setattr(aiohttp.ClientSession, "post", post)
+    return post
+
 
 class TestMockDroneBackendIntegration:
     """Test cases for mock drone to backend integration"""
     
-    @pytest.fixture
-    def client(self):
-        """Create a test client for the FastAPI app"""
-        return TestClient(app)
-    
-    @pytest.fixture(autouse=True)
-    def setup_and_teardown(self):
-        """Setup and teardown for each test"""
-        # Clear drone state manager before each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
-        websocket_manager.active_connections.clear()
-        yield
-        # Clear after each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
-        websocket_manager.active_connections.clear()
-    
     @pytest.fixture
     def mock_drone_instance(self):
         """Create a mock drone instance for testing"""
         config = SimulationConfig()
-        return MockDrone("test_drone", 8889, "http://localhost:8000", config)
+        drone = MockDrone("test_drone", 8889, "http://localhost:8000", config)
+        # pytest keeps fixture values until the session ends; hand out a proxy so
+        # the drone itself is released at teardown
+        yield weakref.proxy(drone)
     
-    @pytest.mark.asyncio
-    async def test_send_state_to_backend(self, mock_drone_instance, client):
+    async def test_send_state_to_backend(self, mock_drone_instance, http_session, patched_post):
         """Test sending drone state to backend"""
-        # Create HTTP session for mock drone
-        mock_drone_instance.http_session = aiohttp.ClientSession()
+        # Use the shared HTTP session for mock drone; its post is stubbed for this test
+        mock_drone_instance.http_session = http_session
         
-        try:
-            # Set up drone state
-            mock_drone_instance.state.position = Vector3(100, 200, 150)
-            mock_drone_instance.state.is_flying = True
-            mock_drone_instance.state.battery = 85
-            
-            # Mock the HTTP request
-            with patch.object(mock_drone_instance.http_session, 'post') as mock_post:
-                mock_response = Mock()
-                mock_response.status = 200
-                mock_post.return_value.__aenter__.return_value = mock_response
-                
-                # Send state to backend
-                await mock_drone_instance.send_state_to_backend()
-                
-                # Verify HTTP request was made
-                mock_post.assert_called_once()
-                call_args = mock_post.call_args
-                
-                # Check URL
-                assert call_args[0][0] == "http://localhost:8000/api/drones/test_drone/state"
-                
-                # Check JSON data
-                json_data = call_args[1]['json']
-                assert json_data['udp_port'] == 8889
-                assert json_data['position']['x'] == 100
-                assert json_data['position']['y'] == 200
-                assert json_data['position']['z'] == 150
-                assert json_data['is_flying'] is True
-                assert json_data['battery'] == 85
+        # Set up drone state
+        mock_drone_instance.state.position = Vector3(100, 200, 150)
+        mock_drone_instance.state.is_flying = True
+        mock_drone_instance.state.battery = 85
+        
+        # Send state to backend
+        await mock_drone_instance.send_state_to_backend()
+        
+        # Verify one request went to the drone's state URL
+        patched_post.assert_called_once_with(
+            "http://localhost:8000/api/drones/test_drone/state", json=ANY
+        )
         
-        finally:
-            await mock_drone_instance.http_session.close()
+        # Check the JSON data carries the state set above
+        assert patched_post.call_args.kwargs["json"].items() >= {
+            "udp_port": 8889,
+            "position": {"x": 100, "y": 200, "z": 150},
+            "is_flying": True,
+            "battery": 85
+        }.items()
     
-    @pytest.mark.asyncio
     async def test_send_state_to_backend_error_handling(self, mock_drone_instance):
         """Test error handling when sending state to backend"""
-        # Create HTTP session for mock drone
-        mock_drone_instance.http_session = aiohttp.ClientSession()
+        # Mock HTTP session whose request fails; no real session is needed
+        mock_post = Mock(side_effect=aiohttp.ClientError("Connection failed"))
+        mock_drone_instance.http_session = AsyncMock(spec=aiohttp.ClientSession, post=mock_post)
         
-        try:
-            # Mock HTTP error
-            with patch.object(mock_drone_instance.http_session, 'post') as mock_post:
-                mock_post.side_effect = aiohttp.ClientError("Connection failed")
-                
-                # Should not raise exception
-                await mock_drone_instance.send_state_to_backend()
-                
-                # Verify error was logged (would need to check logs in real scenario)
-                mock_post.assert_called_once()
+        # Should not raise exception
+        await mock_drone_instance.send_state_to_backend()
         
-        finally:
-            await mock_drone_instance.http_session.close()
+        # Verify error was logged (would need to check logs in real scenario)
+        mock_post.assert_called_once()
     
-    @pytest.mark.asyncio
     async def test_send_state_to_backend_timeout(self, mock_drone_instance):
         """Test timeout handling when sending state to backend"""
-        # Create HTTP session for mock drone
-        mock_drone_instance.http_session = aiohttp.ClientSession()
+        # Mock HTTP session whose request times out; no real session is needed
+        mock_post = Mock(side_effect=asyncio.TimeoutError())
+        mock_drone_instance.http_session = AsyncMock(spec=aiohttp.ClientSession, post=mock_post)
         
-        try:
-            # Mock timeout
-            with patch.object(mock_drone_instance.http_session, 'post') as mock_post:
-                mock_post.side_effect = asyncio.TimeoutError()
-                
-                # Should not raise exception
-                await mock_drone_instance.send_state_to_backend()
-                
-                # Verify timeout was handled
-                mock_post.assert_called_once()
+        # Should not raise exception
+        await mock_drone_instance.send_state_to_backend()
         
-        finally:
-            await mock_drone_instance.http_session.close()
+        # Verify timeout was handled
+        mock_post.assert_called_once()
     
-    @pytest.mark.asyncio
     async def test_backend_update_loop(self, mock_drone_instance):
         """Test backend update loop functionality"""
         # Mock HTTP session and send_state_to_backend
         mock_drone_instance.http_session = Mock()
-        mock_drone_instance.send_state_to_backend = AsyncMock()
+        called = asyncio.Event()
+        mock_drone_instance.send_state_to_backend = AsyncMock(side_effect=lambda: called.set())
         
         # Set short update interval for testing
         mock_drone_instance.backend_update_interval = 0.01  # 100 Hz for fast testing
@@ -139,8 +146,8 @@ class TestMockDroneBackendIntegration:
         # Start update loop
         update_task = asyncio.create_task(mock_drone_instance.backend_update_loop())
         
-        # Let it run for a short time
-        await asyncio.sleep(0.05)
+        # Wait for the first state send instead of sleeping a fixed time
+        await asyncio.wait_for(called.wait(), timeout=1.0)
         
         # Stop the loop
         mock_drone_instance.running = False
@@ -184,37 +191,35 @@ class TestMockDroneBackendIntegration:
         assert data["battery"] == 85
         assert data["temperature"] == 35
     
-    def test_multiple_drones_backend_integration(self, client):
+    async def test_multiple_drones_backend_integration(self, asgi_client):
         """Test multiple drones integration with backend"""
-        # Add multiple drones
-        for i in range(3):
-            drone_id = f"drone_{i}"
-            state_update = {
-                "udp_port": 8889 + i,
-                "position": {"x": i * 100, "y": i * 100, "z": 100},
-                "is_flying": True,
-                "battery": 90 - i * 5
-            }
-            
-            response = client.post(f"/api/drones/{drone_id}/state", json=state_update)
-            assert response.status_code == 200
+        # Add multiple drones concurrently
+        responses = await asyncio.gather(*(
+            asgi_client.post(f"/api/drones/drone_{i}/state", content=body, headers=JSON_HEADERS)
+            for i, body in enumerate(FLEET_STATE_BODIES)
+        ))
+        assert [response.status_code for response in responses] == [200] * len(FLEET_STATE_BODIES)
         
         # Get all drones
-        response = client.get("/api/drones")
+        response = await asgi_client.get("/api/drones")
         assert response.status_code == 200
         
         data = response.json()
         assert data["count"] == 3
         
-        # Verify each drone
-        for i in range(3):
-            drone_id = f"drone_{i}"
-            assert drone_id in data["drones"]
-            drone_data = data["drones"][drone_id]
-            assert drone_data["position"]["x"] == i * 100
-            assert drone_data["battery"] == 90 - i * 5
+        # Verify every drone in one comparison
+        expected = {
+            f"drone_{i}": {
+                "position": {"x": i * 100, "y": i * 100, "z": 100},
+                "battery": 90 - i * 5
+            }
+            for i in range(3)
+        }
+        assert {
+            drone_id: {"position": drone_data["position"], "battery": drone_data["battery"]}
+            for drone_id, drone_data in data["drones"].items()
+        } == expected
     
-    @pytest.mark.asyncio
     async def test_register_with_backend(self, mock_drone_instance):
         """Test drone registration with backend"""
         # Mock HTTP session and send_state_to_backend
@@ -251,68 +256,22 @@ class TestMockDroneBackendIntegration:
         mock_drone_instance.state.speed = 80
         mock_drone_instance.state.rc_values = (25, -50, 75, -100)
         
-        # Create the state data that would be sent to backend
-        state_data = {
-            "udp_port": mock_drone_instance.state.udp_port,
-            "position": {
-                "x": mock_drone_instance.state.position.x,
-                "y": mock_drone_instance.state.position.y,
-                "z": mock_drone_instance.state.position.z
-            },
-            "rotation": {
-                "x": mock_drone_instance.state.rotation.x,
-                "y": mock_drone_instance.state.rotation.y,
-                "z": mock_drone_instance.state.rotation.z
-            },
-            "velocity": {
-                "x": mock_drone_instance.state.velocity.x,
-                "y": mock_drone_instance.state.velocity.y,
-                "z": mock_drone_instance.state.velocity.z
-            },
-            "acceleration": {
-                "x": mock_drone_instance.state.acceleration.x,
-                "y": mock_drone_instance.state.acceleration.y,
-                "z": mock_drone_instance.state.acceleration.z
-            },
-            "is_flying": mock_drone_instance.state.is_flying,
-            "is_connected": mock_drone_instance.state.is_connected,
-            "flight_time": mock_drone_instance.state.flight_time,
-            "battery": mock_drone_instance.state.battery,
-            "temperature": mock_drone_instance.state.temperature,
-            "barometer": mock_drone_instance.state.barometer,
-            "mission_pad_id": mock_drone_instance.state.mission_pad_id,
-            "mission_pad_x": mock_drone_instance.state.mission_pad_x,
-            "mission_pad_y": mock_drone_instance.state.mission_pad_y,
-            "mission_pad_z": mock_drone_instance.state.mission_pad_z,
-            "speed": mock_drone_instance.state.speed,
-            "rc_values": mock_drone_instance.state.rc_values,
-            "last_command_time": mock_drone_instance.state.last_command_time,
-            "last_update_time": mock_drone_instance.state.last_update_time
-        }
+        state_data = mock_drone_instance.get_backend_state()
         
         # Verify all expected fields are present
-        expected_fields = [
+        expected_fields = {
             "udp_port", "position", "rotation", "velocity", "acceleration",
             "is_flying", "is_connected", "flight_time", "battery", "temperature",
             "barometer", "mission_pad_id", "mission_pad_x", "mission_pad_y", "mission_pad_z",
             "speed", "rc_values", "last_command_time", "last_update_time"
-        ]
-        
-        for field in expected_fields:
-            assert field in state_data, f"Missing field: {field}"
+        }
+        missing = expected_fields.difference(state_data)
+        assert not missing, f"Missing fields: {missing}"
         
         # Verify nested structures
-        assert "x" in state_data["position"]
-        assert "y" in state_data["position"]
-        assert "z" in state_data["position"]
-        
-        assert "x" in state_data["rotation"]
-        assert "y" in state_data["rotation"]
-        assert "z" in state_data["rotation"]
-        
-        assert "x" in state_data["velocity"]
-        assert "y" in state_data["velocity"]
-        assert "z" in state_data["velocity"]
+        for vector_field in ("position", "rotation", "velocity", "acceleration"):
+            assert set(state_data[vector_field]) == {"x", "y", "z"}
+        assert state_data["position"] == {"x": 123.45, "y": 678.90, "z": 234.56}
         
         # Verify data types
         assert isinstance(state_data["is_flying"], bool)
@@ -321,73 +280,91 @@ class TestMockDroneBackendIntegration:
         assert isinstance(state_data["rc_values"], tuple)
 
 
+class RecordingWS:
+    """WebSocket stand-in that records what the backend broadcasts to it"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    async def accept(self):
+        pass
+    
+    async def send_text(self, message):
+        self.sent.append(message)
+
+
 class TestWebSocketIntegration:
     """Test WebSocket integration with mock drones"""
     
-    @pytest.fixture(autouse=True)
-    def setup_and_teardown(self):
-        """Setup and teardown for each test"""
-        # Clear state before each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
-        websocket_manager.active_connections.clear()
-        yield
-        # Clear after each test
-        drone_state_manager.drones.clear()
-        drone_state_manager.last_update_times.clear()
-        websocket_manager.active_connections.clear()
+    @pytest_asyncio.fixture
+    async def websocket(self, ws_manager):
+        """Register a recording WebSocket with the test's WebSocketManager"""
+        websocket = RecordingWS()
+        await ws_manager.connect(websocket)
+        yield websocket
+        ws_manager.disconnect(websocket)
     
-    def test_websocket_receives_drone_updates(self):
-        """Test that WebSocket clients receive drone state updates"""
-        client = TestClient(app)
+    def test_websocket_route_snapshot_and_broadcasts(self, client, state_manager):
+        """Test the /ws route end to end: connect-time snapshot, then broadcasts"""
+        state_manager.add_drone(DroneState("existing_drone", 8889, battery=70))
         
-        # Connect WebSocket
         with client.websocket_connect("/ws") as websocket:
-            # Add a drone via API (simulating mock drone update)
-            state_update = {
-                "udp_port": 8889,
-                "position": {"x": 100, "y": 200, "z": 150},
-                "is_flying": True,
-                "battery": 85
-            }
+            snapshot = loads(websocket.receive_text())
+            assert snapshot["type"] == "snapshot"
+            assert [drone["drone_id"] for drone in snapshot["drones"]] == ["existing_drone"]
+            assert snapshot["drones"][0]["battery"] == 70
             
-            # This would normally be done by mock drone, but we simulate it
-            response = client.post("/api/drones/test_drone/state", json=state_update)
+            response = client.post("/api/drones/new_drone/state", json={"udp_port": 8890, "battery": 85})
             assert response.status_code == 200
             
-            # WebSocket should receive drone_added message
-            data = websocket.receive_text()
-            message = json.loads(data)
+            added = loads(websocket.receive_text())
+            assert added["type"] == "drone_added"
+            assert added["drone_id"] == "new_drone"
             
-            assert message["type"] == "drone_added"
-            assert message["drone_id"] == "test_drone"
-            assert message["initial_state"]["battery"] == 85
-            assert message["initial_state"]["position"]["x"] == 100
+            update = loads(websocket.receive_text())
+            assert update["type"] == "drone_state_update"
+            assert update["drone_id"] == "new_drone"
+            assert update["state"]["battery"] == 85
     
-    def test_websocket_receives_multiple_drone_updates(self):
-        """Test WebSocket receives updates for multiple drones"""
-        client = TestClient(app)
+    async def test_websocket_receives_drone_updates(self, asgi_client, websocket, ws_manager):
+        """Test that WebSocket clients receive drone state updates"""
+        # Add a drone via API (simulating mock drone update)
+        state_update = {
+            "udp_port": 8889,
+            "position": {"x": 100, "y": 200, "z": 150},
+            "is_flying": True,
+            "battery": 85
+        }
         
-        with client.websocket_connect("/ws") as websocket:
-            # Add multiple drones
-            for i in range(2):
-                drone_id = f"drone_{i}"
-                state_update = {
-                    "udp_port": 8889 + i,
-                    "position": {"x": i * 100, "y": i * 100, "z": 100},
-                    "battery": 90 - i * 10
-                }
-                
-                response = client.post(f"/api/drones/{drone_id}/state", json=state_update)
-                assert response.status_code == 200
-                
-                # Receive WebSocket message
-                data = websocket.receive_text()
-                message = json.loads(data)
-                
-                assert message["type"] == "drone_added"
-                assert message["drone_id"] == drone_id
-                assert message["initial_state"]["battery"] == 90 - i * 10
+        # This would normally be done by mock drone, but we simulate it
+        response = await asgi_client.post("/api/drones/test_drone/state", json=state_update)
+        assert response.status_code == 200
+        
+        # WebSocket should receive drone_added message
+        await ws_manager.flush()
+        message = loads(websocket.sent[0])
+        
+        assert message["type"] == "drone_added"
+        assert message["drone_id"] == "test_drone"
+        assert message["initial_state"]["battery"] == 85
+        assert message["initial_state"]["position"]["x"] == 100
+    
+    async def test_websocket_receives_multiple_drone_updates(self, asgi_client, websocket, ws_manager):
+        """Test WebSocket receives updates for multiple drones"""
+        # Add multiple drones
+        for i, body in enumerate(WS_STATE_BODIES):
+            drone_id = f"drone_{i}"
+            first_new = len(websocket.sent)
+            response = await asgi_client.post(f"/api/drones/{drone_id}/state", content=body, headers=JSON_HEADERS)
+            assert response.status_code == 200
+            
+            # Receive WebSocket message
+            await ws_manager.flush()
+            message = loads(websocket.sent[first_new])
+            
+            assert message["type"] == "drone_added"
+            assert message["drone_id"] == drone_id
+            assert message["initial_state"]["battery"] == 90 - i * 10
 
 
 if __name__ == "__main__":
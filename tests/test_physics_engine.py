@@ -4,22 +4,60 @@ Unit tests for PhysicsEngine realistic drone simulation
 import pytest
 import time
 import math
-import sys
-import os
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
 
-from mock_drone.physics_engine import PhysicsEngine
+from mock_drone.physics_engine import PhysicsEngine, _normalize_xyz
 from backend.models import DroneState, Vector3, SimulationConfig
 
 
+# (axis, position, velocity, expected position and velocity on that axis, is_flying
+# afterwards) for the config's (1000, 1000, 500) scene bounds; None skips a check.
+# A flying drone pushed below ground is clamped to it but keeps flying: the engine
+# only clears is_flying when a landing animation reaches the ground.
+BOUNDARY_CASES = [
+    ("x", (600, 0, 0), (50, 0, 0), 500, 0, None),
+    ("y", (0, -600, 0), (0, -50, 0), -500, 0, None),
+    ("z", (0, 0, -10), (0, 0, 0), 0, None, True),
+]
+
+
+class ManualClock:
+    """Stand-in for time.time that only moves when advanced"""
+    
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def run_until_animation_done(engine, drone_state, max_seconds=3.0):
+    """Tick the engine at its update rate until the drone's animation completes
+    
+    The engine runs on a ManualClock, so each tick advances it by dt instead
+    of sleeping.
+    """
+    dt = 1.0 / engine.config.update_rate
+    for _ in range(int(max_seconds / dt)):
+        if drone_state.drone_id not in engine.animations:
+            return
+        engine.clock.advance(dt)
+        engine.update_drone_physics(drone_state, dt)
+    assert drone_state.drone_id not in engine.animations, (
+        f"animation still running after {max_seconds}s of ticks"
+    )
+
+
 class TestPhysicsEngine:
     """Test cases for PhysicsEngine class"""
     
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def config(self):
-        """Create a simulation config for testing"""
+        """Create a simulation config for testing; tests only read it"""
         return SimulationConfig(
             update_rate=30,
             gravity=9.81,
@@ -31,8 +69,8 @@ class TestPhysicsEngine:
     
     @pytest.fixture
     def physics_engine(self, config):
-        """Create a physics engine instance for testing"""
-        return PhysicsEngine(config)
+        """Create a physics engine instance for testing, timed by a manual clock"""
+        return PhysicsEngine(config, clock=ManualClock())
     
     @pytest.fixture
     def drone_state(self):
@@ -49,6 +87,8 @@ class TestPhysicsEngine:
         """Test physics engine initialization"""
         assert physics_engine.config == config
         assert physics_engine.gravity == config.gravity
+        assert physics_engine.gravity_cm == 981.0
+        assert physics_engine.half_bounds == (500, 500, 250)
         assert physics_engine.air_resistance == config.air_resistance
         assert physics_engine.max_acceleration == config.max_acceleration
         assert physics_engine.takeoff_speed == 50
@@ -100,23 +140,24 @@ class TestPhysicsEngine:
         assert animation['target_position'] == target_position
         assert animation['speed'] == speed
     
-    def test_flip_animation(self, physics_engine, drone_state):
+    @pytest.mark.parametrize("direction,expected_axis,expected_amount", [
+        ("l", "y", 360),
+        ("r", "y", -360),
+        ("f", "x", 360),
+        ("b", "x", -360),
+    ])
+    def test_flip_animation(self, physics_engine, drone_state, direction, expected_axis, expected_amount):
         """Test flip animation"""
         drone_state.is_flying = True
         
-        # Test different flip directions
-        for direction in ['l', 'r', 'f', 'b']:
-            physics_engine.start_flip_animation(drone_state, direction)
-            
-            assert drone_state.drone_id in physics_engine.animations
-            
-            animation = physics_engine.animations[drone_state.drone_id]
-            assert animation['type'] == 'flip'
-            assert animation['axis'] in ['x', 'y']
-            assert abs(animation['rotation_amount']) == 360
-            
-            # Clear animation for next test
-            del physics_engine.animations[drone_state.drone_id]
+        physics_engine.start_flip_animation(drone_state, direction)
+        
+        assert drone_state.drone_id in physics_engine.animations
+        
+        animation = physics_engine.animations[drone_state.drone_id]
+        assert animation['type'] == 'flip'
+        assert animation['axis'] == expected_axis
+        assert animation['rotation_amount'] == expected_amount
     
     def test_rotation_animation(self, physics_engine, drone_state):
         """Test rotation animation"""
@@ -137,18 +178,57 @@ class TestPhysicsEngine:
         
         # Set some initial velocity
         drone_state.velocity = Vector3(10, 20, 30)
-        initial_position = Vector3(drone_state.position.x, drone_state.position.y, drone_state.position.z)
+        ix, iy, iz = drone_state.position.as_tuple()
         
         physics_engine.update_drone_physics(drone_state, dt)
         
         # Position should be updated based on velocity
-        expected_x = initial_position.x + 10 * dt
-        expected_y = initial_position.y + 20 * dt
-        expected_z = initial_position.z + 30 * dt
+        expected_x = ix + 10 * dt
+        expected_y = iy + 20 * dt
+        expected_z = iz + 30 * dt
         
-        assert abs(drone_state.position.x - expected_x) < 0.01
-        assert abs(drone_state.position.y - expected_y) < 0.01
-        assert abs(drone_state.position.z - expected_z) < 0.01
+        assert drone_state.position.as_tuple() == pytest.approx((expected_x, expected_y, expected_z), abs=0.01)
+    
+    def test_physics_update_vectorized(self, config):
+        """Test the swarm update matches per-drone updates"""
+        dt = 1.0 / 30.0
+        rng = np.random.default_rng(0)
+        positions = rng.uniform(-700, 700, size=(50, 3))
+        velocities = rng.uniform(-100, 100, size=(50, 3))
+        flying = rng.random(50) < 0.7
+        rotating = rng.random(50) < 0.2
+        
+        def make_swarm(engine):
+            drones = []
+            for i in range(50):
+                drone = DroneState(
+                    drone_id=f"drone_{i}",
+                    udp_port=9000 + i,
+                    position=Vector3(*positions[i]),
+                    velocity=Vector3(*velocities[i]),
+                    is_flying=bool(flying[i]),
+                )
+                if rotating[i]:
+                    engine.start_rotation_animation(drone, 90)
+                drones.append(drone)
+            return drones
+        
+        clock = ManualClock()
+        loop_engine = PhysicsEngine(config, clock=clock)
+        looped = make_swarm(loop_engine)
+        batch_engine = PhysicsEngine(config, clock=clock)
+        batched = make_swarm(batch_engine)
+        
+        for _ in range(5):
+            clock.advance(dt)
+            for drone in looped:
+                loop_engine.update_drone_physics(drone, dt)
+            batch_engine.update_all_drones(batched, dt)
+        
+        for expected, actual in zip(looped, batched):
+            np.testing.assert_allclose(actual.position.as_tuple(), expected.position.as_tuple())
+            np.testing.assert_allclose(actual.velocity.as_tuple(), expected.velocity.as_tuple())
+            assert actual.is_flying == expected.is_flying
     
     def test_gravity_application(self, physics_engine, drone_state):
         """Test gravity application"""
@@ -162,7 +242,7 @@ class TestPhysicsEngine:
         gravity_cm = physics_engine.gravity * 100  # Convert to cm/s²
         expected_velocity_z = initial_velocity_z - gravity_cm * dt
         
-        assert abs(drone_state.velocity.z - expected_velocity_z) < 0.01
+        assert drone_state.velocity.z == pytest.approx(expected_velocity_z, abs=0.01)
     
     def test_air_resistance(self, physics_engine, drone_state):
         """Test air resistance application"""
@@ -175,40 +255,27 @@ class TestPhysicsEngine:
         resistance_factor = 1.0 - (physics_engine.air_resistance * dt)
         expected_velocity = 100 * resistance_factor
         
-        assert abs(drone_state.velocity.x - expected_velocity) < 0.01
-        assert abs(drone_state.velocity.y - expected_velocity) < 0.01
-        assert abs(drone_state.velocity.z - expected_velocity) < 0.01
+        assert drone_state.velocity.as_tuple() == pytest.approx((expected_velocity,) * 3, abs=0.01)
     
-    def test_boundary_constraints(self, physics_engine, drone_state):
+    @pytest.mark.parametrize(
+        "axis,position,velocity,expected_position,expected_velocity,is_flying_after",
+        BOUNDARY_CASES, ids=["x", "y", "z_ground"]
+    )
+    def test_boundary_constraints(self, physics_engine, drone_state, axis, position, velocity,
+                                  expected_position, expected_velocity, is_flying_after):
         """Test scene boundary constraints"""
-        bounds = physics_engine.config.scene_bounds
-        
-        # Test X boundary
-        drone_state.position.x = bounds[0] / 2 + 100  # Beyond boundary
-        drone_state.velocity.x = 50
+        drone_state.position = Vector3(*position)
+        drone_state.velocity = Vector3(*velocity)
+        if is_flying_after is not None:
+            drone_state.is_flying = True
         
         physics_engine.update_drone_physics(drone_state, 0.1)
         
-        assert drone_state.position.x == bounds[0] / 2
-        assert drone_state.velocity.x == 0
-        
-        # Test Y boundary
-        drone_state.position.y = -bounds[1] / 2 - 100  # Beyond boundary
-        drone_state.velocity.y = -50
-        
-        physics_engine.update_drone_physics(drone_state, 0.1)
-        
-        assert drone_state.position.y == -bounds[1] / 2
-        assert drone_state.velocity.y == 0
-        
-        # Test Z boundary (ground)
-        drone_state.position.z = -10  # Below ground
-        drone_state.is_flying = True
-        
-        physics_engine.update_drone_physics(drone_state, 0.1)
-        
-        assert drone_state.position.z == 0
-        assert not drone_state.is_flying
+        assert getattr(drone_state.position, axis) == expected_position
+        if expected_velocity is not None:
+            assert getattr(drone_state.velocity, axis) == expected_velocity
+        if is_flying_after is not None:
+            assert drone_state.is_flying == is_flying_after
     
     def test_takeoff_animation_progress(self, physics_engine, drone_state):
         """Test takeoff animation progress over time"""
@@ -219,6 +286,7 @@ class TestPhysicsEngine:
         
         # Update physics multiple times
         for _ in range(10):
+            physics_engine.clock.advance(dt)
             physics_engine.update_drone_physics(drone_state, dt)
         
         # Drone should be moving upward
@@ -232,12 +300,8 @@ class TestPhysicsEngine:
         
         physics_engine.start_landing_animation(drone_state)
         
-        # Simulate animation progress
-        dt = 1.0 / 30.0
-        
-        # Update physics multiple times
-        for _ in range(50):  # More iterations for landing
-            physics_engine.update_drone_physics(drone_state, dt)
+        # Landing from 100cm at 30cm/s takes a little over 3 seconds
+        run_until_animation_done(physics_engine, drone_state, max_seconds=4.0)
         
         # Drone should be on ground and not flying
         assert drone_state.position.z == 0
@@ -245,12 +309,12 @@ class TestPhysicsEngine:
     
     def test_animation_completion(self, physics_engine, drone_state):
         """Test animation completion and cleanup"""
+        drone_state.is_flying = True  # movement animations only start in flight
         target_position = Vector3(100, 100, 100)
         physics_engine.start_movement_animation(drone_state, target_position, 100)
         
-        # Simulate long enough time for animation to complete
-        dt = 1.0
-        physics_engine.update_drone_physics(drone_state, dt)
+        # Tick at the engine's update rate until the animation completes
+        run_until_animation_done(physics_engine, drone_state)
         
         # Animation should be completed and removed
         assert drone_state.drone_id not in physics_engine.animations
@@ -282,7 +346,7 @@ class TestPhysicsEngine:
         
         distance = physics_engine._calculate_distance(pos3, pos4)
         expected = math.sqrt(3*3 + 4*4 + 4*4)  # sqrt(9 + 16 + 16) = sqrt(41)
-        assert abs(distance - expected) < 0.01
+        assert distance == pytest.approx(expected, abs=0.01)
     
     def test_vector_normalization(self, physics_engine):
         """Test vector normalization"""
@@ -291,13 +355,18 @@ class TestPhysicsEngine:
         
         # Length should be 1
         length = math.sqrt(normalized.x**2 + normalized.y**2 + normalized.z**2)
-        assert abs(length - 1.0) < 0.01
+        assert length == pytest.approx(1.0, abs=0.01)
         
-        # Direction should be preserved
-        assert abs(normalized.x - 0.6) < 0.01  # 3/5
-        assert abs(normalized.y - 0.8) < 0.01  # 4/5
+        # Direction should be preserved: (3/5, 4/5, 0)
+        assert normalized.as_tuple()[:2] == pytest.approx((0.6, 0.8), abs=0.01)
         assert normalized.z == 0.0
     
+    def test_vector_normalization_zero_length(self, physics_engine):
+        """Test normalizing the zero vector leaves it at zero"""
+        assert physics_engine._normalize_vector(Vector3()) == Vector3()
+        assert _normalize_xyz(0.0, 0.0, 0.0) == (0.0, 0.0, 0.0)
+        assert _normalize_xyz(0.0, 0.0, -2.0) == (0.0, 0.0, -1.0)
+    
     def test_cubic_bezier(self, physics_engine):
         """Test cubic Bezier interpolation"""
         # Test boundary values
@@ -331,6 +400,8 @@ class TestPhysicsEngine:
         """Test handling multiple drone animations simultaneously"""
         drone1 = DroneState("drone1", 8889)
         drone2 = DroneState("drone2", 8890)
+        drone2.is_flying = True  # landing only starts in flight
+        drone2.position.z = 100
         
         # Start different animations for each drone
         physics_engine.start_takeoff_animation(drone1)
@@ -343,6 +414,52 @@ class TestPhysicsEngine:
         # Animations should be independent
         assert physics_engine.animations["drone1"]["type"] == "takeoff"
         assert physics_engine.animations["drone2"]["type"] == "landing"
+    
+    def test_update_all_drones_with_animations(self, config):
+        """Test the swarm update matches per-drone updates in any drone order"""
+        dt = 1.0 / 30.0
+        
+        def make_swarm(engine):
+            drones = []
+            for i in range(64):
+                drone = DroneState(f"drone_{i}", 9000 + i, position=Vector3(i * 10.0, 0, 0))
+                kind = i % 4
+                if kind == 0:
+                    engine.start_takeoff_animation(drone)
+                elif kind == 1:
+                    drone.is_flying = True
+                    drone.position.z = 100
+                    engine.start_landing_animation(drone)
+                elif kind == 2:
+                    drone.is_flying = True
+                    drone.position.z = 100
+                    engine.start_movement_animation(drone, Vector3(0, 200, 150), 100)
+                else:
+                    drone.is_flying = True
+                    drone.position.z = 100
+                    engine.start_rotation_animation(drone, 90)
+                drones.append(drone)
+            return drones
+        
+        clock = ManualClock()
+        serial_engine = PhysicsEngine(config, clock=clock)
+        serial = make_swarm(serial_engine)
+        batch_engine = PhysicsEngine(config, clock=clock)
+        batched = make_swarm(batch_engine)
+        reversed_batch = batched[::-1]
+        
+        # Long enough for every animation to complete part way through
+        for _ in range(120):
+            clock.advance(dt)
+            for drone in serial:
+                serial_engine.update_drone_physics(drone, dt)
+            batch_engine.update_all_drones(reversed_batch, dt)
+        
+        for expected, actual in zip(serial, batched):
+            np.testing.assert_allclose(actual.position.as_tuple(), expected.position.as_tuple())
+            np.testing.assert_allclose(actual.velocity.as_tuple(), expected.velocity.as_tuple())
+            np.testing.assert_allclose(actual.rotation.as_tuple(), expected.rotation.as_tuple())
+            assert actual.is_flying == expected.is_flying
 
 
 if __name__ == "__main__":
@@ -4,11 +4,6 @@ Unit tests for TelemetrySimulator realistic sensor data generation
 import pytest
 import time
 import math
-import sys
-import os
-
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from mock_drone.telemetry_simulator import TelemetrySimulator
 from backend.models import DroneState, Vector3, SimulationConfig
@@ -272,25 +267,78 @@ class TestTelemetrySimulator:
         assert drone_state.mission_pad_id == 1
     
     def test_sensor_noise_application(self, telemetry_simulator, drone_state):
-        """Test that sensor noise is applied"""
-        original_position = Vector3(drone_state.position.x, drone_state.position.y, drone_state.position.z)
-        original_velocity = Vector3(drone_state.velocity.x, drone_state.velocity.y, drone_state.velocity.z)
-        original_rotation = Vector3(drone_state.rotation.x, drone_state.rotation.y, drone_state.rotation.z)
-        
-        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        """Test that sensor noise is applied only when reporting"""
+        drone_state.acceleration = Vector3(100, 100, 100)
         
-        # Position should have some noise (test multiple times)
-        position_changed = False
+        # Reported acceleration should have some noise (test multiple times)
+        acceleration_changed = False
         for _ in range(10):
-            drone_state.position = Vector3(100, 100, 100)
-            telemetry_simulator._add_sensor_noise(drone_state)
-            if (drone_state.position.x != 100 or 
-                drone_state.position.y != 100 or 
-                drone_state.position.z != 100):
-                position_changed = True
+            state_string = telemetry_simulator.get_tello_state_string(drone_state)
+            if "agx:100;agy:100;agz:100;" not in state_string:
+                acceleration_changed = True
                 break
         
-        assert position_changed
+        assert acceleration_changed
+        
+        # The underlying state should not be modified by reporting
+        assert drone_state.acceleration == Vector3(100, 100, 100)
+    
+    def test_batch_telemetry_update(self, telemetry_simulator):
+        """Test batched telemetry update across several drones"""
+        drones = [
+            DroneState(drone_id="near_pad_1", udp_port=8889, position=Vector3(105, 95, 150)),
+            DroneState(drone_id="near_pad_6", udp_port=8890, position=Vector3(190, 10, 100)),
+            DroneState(drone_id="far_away", udp_port=8891, position=Vector3(500, 500, 150)),
+            DroneState(drone_id="too_high", udp_port=8892, position=Vector3(100, 100, 400)),
+        ]
+        for drone in drones:
+            drone.is_flying = True
+        
+        telemetry_simulator.update_telemetry_batch(drones, 1.0)
+        
+        assert [d.mission_pad_id for d in drones] == [1, 6, -1, -1]
+        assert abs(drones[0].mission_pad_x - 5) < 10
+        assert abs(drones[0].mission_pad_y - (-5)) < 10
+        assert abs(drones[0].mission_pad_z - 150) <= 3
+        assert drones[2].mission_pad_x == -100
+        assert drones[2].mission_pad_z == -100
+        for drone in drones:
+            assert drone.battery < 100
+            assert 0 <= drone.temperature <= 80
+            assert abs(drone.barometer - drone.position.z) <= 5
+            assert drone.acceleration.z < 0  # Gravity while flying
+    
+    def test_batch_battery_critical_level(self, telemetry_simulator):
+        """Test batched battery update lands only flying drones at critical level"""
+        drones = [
+            DroneState(drone_id="critical", udp_port=8889, position=Vector3(0, 0, 150)),
+            DroneState(drone_id="healthy", udp_port=8890, position=Vector3(0, 0, 150)),
+            DroneState(drone_id="empty", udp_port=8891, position=Vector3(0, 0, 150)),
+        ]
+        for drone in drones:
+            drone.is_flying = True
+        drones[0].battery = 3
+        drones[2].battery = 0  # Already drained; left untouched
+        
+        telemetry_simulator.update_telemetry_batch(drones, 1.0)
+        
+        assert not drones[0].is_flying
+        assert drones[0].position.z == 0
+        assert drones[1].is_flying
+        assert drones[1].position.z == 150
+        assert drones[2].is_flying
+        assert drones[2].battery == 0
+    
+    def test_batch_telemetry_update_empty(self, telemetry_simulator):
+        """Test batched telemetry update with no drones or no mission pads"""
+        telemetry_simulator.update_telemetry_batch([], 1.0)
+        
+        drone = DroneState(drone_id="test_drone", udp_port=8889, position=Vector3(100, 100, 150))
+        for pad_id in list(telemetry_simulator.get_mission_pad_positions()):
+            telemetry_simulator.remove_mission_pad(pad_id)
+        
+        telemetry_simulator.update_telemetry_batch([drone], 1.0)
+        assert drone.mission_pad_id == -1
     
     def test_tello_state_string_generation(self, telemetry_simulator, drone_state):
         """Test Tello state string generation"""
@@ -336,6 +384,36 @@ class TestTelemetrySimulator:
         assert "y:-200" in state_string
         assert "z:-200" in state_string
     
+    def test_report_noise_follows_amplitude_changes(self, telemetry_simulator, drone_state):
+        """Test that changed noise amplitudes are used by later reports"""
+        drone_state.rotation = Vector3(5.5, -3.5, 90.5)
+        drone_state.velocity = Vector3(20.5, -10.5, 5.5)
+        drone_state.acceleration = Vector3(10.5, -5.5, -980.5)
+        telemetry_simulator.get_tello_state_string(drone_state)
+        
+        telemetry_simulator.rotation_noise = 0.0
+        telemetry_simulator.velocity_noise = 0.0
+        telemetry_simulator.acceleration_noise = 0.0
+        state_string = telemetry_simulator.get_tello_state_string(drone_state)
+        
+        assert "mpry:5;-3;90;" in state_string
+        assert "vgx:20;vgy:-10;vgz:5;" in state_string
+        assert "agx:10;agy:-5;agz:-980;" in state_string
+    
+    def test_seeded_simulators_are_reproducible(self, config):
+        """Test that simulators with the same seed produce the same telemetry"""
+        outputs = []
+        for _ in range(2):
+            simulator = TelemetrySimulator(config, seed=42)
+            drone = DroneState(drone_id="test_drone", udp_port=8889, position=Vector3(105, 95, 150))
+            drone.is_flying = True
+            drone.velocity = Vector3(20, 0, 0)
+            for _ in range(5):
+                simulator.update_telemetry(drone, 1.0)
+            outputs.append(simulator.get_tello_state_string(drone))
+        
+        assert outputs[0] == outputs[1]
+    
     def test_sensor_failure_simulation(self, telemetry_simulator, drone_state):
         """Test sensor failure simulation"""
         # Test battery sensor failure
@@ -360,6 +438,10 @@ class TestTelemetrySimulator:
         assert drone_state.acceleration.x == 0
         assert drone_state.acceleration.y == 0
         assert drone_state.acceleration.z == 0
+        
+        # Unknown sensor types are ignored
+        telemetry_simulator.simulate_sensor_failure(drone_state, "gyroscope")
+        assert drone_state.battery == 0
     
     def test_mission_pad_management(self, telemetry_simulator):
         """Test mission pad addition and removal"""
@@ -376,6 +458,19 @@ class TestTelemetrySimulator:
         mission_pads = telemetry_simulator.get_mission_pad_positions()
         assert 9 not in mission_pads
     
+    def test_mission_pad_management_affects_detection(self, telemetry_simulator, drone_state):
+        """Test that added and removed mission pads are used by detection"""
+        drone_state.position = Vector3(400, 400, 150)  # Out of range of the default pads
+        drone_state.is_flying = True
+        
+        telemetry_simulator.add_mission_pad(9, Vector3(410, 390, 0))
+        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        assert drone_state.mission_pad_id == 9
+        
+        telemetry_simulator.remove_mission_pad(9)
+        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        assert drone_state.mission_pad_id == -1
+    
     def test_detection_range_setting(self, telemetry_simulator):
         """Test mission pad detection range setting"""
         # Set custom detection range
@@ -389,6 +484,23 @@ class TestTelemetrySimulator:
         telemetry_simulator.set_detection_range(1000)  # Too large
         assert telemetry_simulator.mission_pad_detection_range == 500  # Maximum
     
+    def test_detection_range_affects_detection(self, telemetry_simulator, drone_state):
+        """Test that a changed detection range is used by mission pad detection"""
+        drone_state.position = Vector3(160, 160, 150)  # ~85cm from pad 1
+        drone_state.is_flying = True
+        
+        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        assert drone_state.mission_pad_id == 1
+        
+        telemetry_simulator.set_detection_range(50)
+        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        assert drone_state.mission_pad_id == -1
+        
+        # Assigning the range directly is honoured too
+        telemetry_simulator.mission_pad_detection_range = 100
+        telemetry_simulator.update_telemetry(drone_state, 1.0)
+        assert drone_state.mission_pad_id == 1
+    
     def test_battery_reset(self, telemetry_simulator, drone_state):
         """Test battery reset functionality"""
         # Drain battery